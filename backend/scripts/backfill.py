@@ -0,0 +1,37 @@
+"""
+Rebuild collections that are derived from other collections and maintained incrementally by the API.
+
+Usage: `poetry run python ./scripts/backfill.py [target ...]` (uses `database_uri` from `settings.yaml`).
+Without arguments all targets are rebuilt. The API rebuilds missing ones on startup by itself.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# add parent dir to sys.path
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.api.backfill import TARGETS  # noqa: E402
+from src.api.lifespan import setup_database  # noqa: E402
+
+
+async def main(targets: list[str]) -> None:
+    motor_client = await setup_database()
+    for target in targets:
+        print(f"➡ Rebuilding `{target}`...")
+        rebuild, _, _ = TARGETS[target]
+        await rebuild()
+        print(f"✅ `{target}` rebuilt")
+    motor_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("targets", nargs="*", help=f"what to rebuild: {', '.join(TARGETS)} (default: all)")
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+    asyncio.run(main(args.targets or list(TARGETS)))
@@ -0,0 +1,123 @@
+"""
+Benchmark range filters (age, date, participant count) of event search on a synthetic collection.
+
+Usage: `poetry run python ./scripts/benchmark_filters.py [--events 100000] [--repeat 20]`.
+Events are generated in a separate `<database>_benchmark` database of the `database_uri` from `settings.yaml`,
+the database is dropped afterwards. For every filter the legacy predicate (as it was built before the
+range-overlap builder) is compared with the current one: median time and documents/keys examined.
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# add parent dir to sys.path
+sys.path.append(str(Path(__file__).parents[1]))
+
+from beanie import init_beanie  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from src.config import settings  # noqa: E402
+from src.modules.events.repository import events_repository  # noqa: E402
+from src.modules.events.schemas import DateFilter, Filters, MinMaxFilter  # noqa: E402
+from src.storages.mongo import Event  # noqa: E402
+
+NOW = datetime.datetime.now(datetime.UTC)
+MONTH_START = NOW.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+MONTH_END = MONTH_START + datetime.timedelta(days=31)
+
+
+def synthetic_event(i: int) -> dict:
+    start = NOW + datetime.timedelta(days=random.randint(-3 * 365, 365), hours=random.randint(0, 23))
+    age_min = random.choice([None, 6, 10, 14, 18])
+    return {
+        "title": f"Соревнование {i}",
+        "status": random.choice(["draft", "on_consideration", "accredited", "rejected"]),
+        "discipline": [random.choice(["программирование алгоритмическое", "программирование продуктовое"])],
+        "start_date": start,
+        "end_date": start + datetime.timedelta(days=random.randint(0, 14)),
+        "age_min": age_min,
+        "age_max": random.choice([None, (age_min or 0) + random.randint(2, 30)]),
+        "participant_count": random.choice([None, random.randint(5, 5000)]),
+        "location": [{"country": "Россия", "region": f"Регион {random.randint(1, 89)}"}],
+    }
+
+
+def legacy_queries() -> dict[str, dict]:
+    # Predicates produced by the previous implementation of the events filter
+    return {
+        "age 10-14": {"age_min": {"$lte": 14}},
+        "date in month": {
+            "$and": [
+                {
+                    "$nor": [
+                        {"$and": [{"start_date": {"$gt": MONTH_START}}, {"start_date": {"$gt": MONTH_END}}]},
+                        {"$and": [{"end_date": {"$lt": MONTH_START}}, {"end_date": {"$lt": MONTH_END}}]},
+                    ]
+                },
+                {"end_date": {"$lte": MONTH_END}},
+            ]
+        },
+        "participant_count >= 1000": {"participant_count": {"$gte": 1000}},
+    }
+
+
+async def current_queries() -> dict[str, dict]:
+    async def build(**filters) -> dict:
+        return (await events_repository._filter_query(Filters(**filters))).get_filter_query()
+
+    return {
+        "age 10-14": await build(age=MinMaxFilter(min=10, max=14)),
+        "date in month": await build(date=DateFilter(start_date=MONTH_START, end_date=MONTH_END)),
+        "participant_count >= 1000": await build(participant_count=MinMaxFilter(min=1000)),
+    }
+
+
+async def measure(query: dict, repeat: int) -> tuple[float, int, int, int]:
+    collection = Event.get_motor_collection()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = await collection.count_documents(query)
+        timings.append(time.perf_counter() - start)
+    explain = await collection.find(query).explain()
+    stats = explain["executionStats"]
+    return statistics.median(timings) * 1000, found, stats["totalDocsExamined"], stats["totalKeysExamined"]
+
+
+async def main(events: int, repeat: int) -> None:
+    motor_client = AsyncIOMotorClient(settings.database_uri.get_secret_value(), tz_aware=True)
+    motor_client.get_io_loop = asyncio.get_running_loop  # type: ignore[method-assign]
+    database = motor_client.get_database(f"{motor_client.get_database().name}_benchmark")
+    await motor_client.drop_database(database)
+    await init_beanie(database=database, document_models=[Event])
+
+    try:
+        print(f"➡ Generating {events} events...")
+        collection = Event.get_motor_collection()
+        batch = 10_000
+        for offset in range(0, events, batch):
+            await collection.insert_many([synthetic_event(i) for i in range(offset, min(offset + batch, events))])
+
+        legacy, current = legacy_queries(), await current_queries()
+        print(f"{'filter':<28}{'variant':<10}{'ms':>10}{'found':>10}{'docs':>10}{'keys':>10}")
+        for name in current:
+            for variant, query in (("legacy", legacy[name]), ("current", current[name])):
+                ms, found, docs, keys = await measure(query, repeat)
+                print(f"{name:<28}{variant:<10}{ms:>10.1f}{found:>10}{docs:>10}{keys:>10}")
+    finally:
+        await motor_client.drop_database(database)
+        motor_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100_000, help="number of synthetic events")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each query")
+    args = parser.parse_args()
+    asyncio.run(main(args.events, args.repeat))
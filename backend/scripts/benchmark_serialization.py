@@ -0,0 +1,109 @@
+"""
+Benchmark serialization of list responses: response model (as FastAPI does it) vs raw documents encoder.
+
+Usage: `poetry run python ./scripts/benchmark_serialization.py [--events 5000] [--repeat 10]`.
+Events are generated in a separate `<database>_benchmark` database of the `database_uri` from `settings.yaml`,
+the database is dropped afterwards. Both paths read the same documents and must produce equal JSON.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# add parent dir to sys.path
+sys.path.append(str(Path(__file__).parents[1]))
+
+from beanie import init_beanie  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from src.api.raw_json import raw_encoder  # noqa: E402
+from src.config import settings  # noqa: E402
+from src.storages.mongo import Event  # noqa: E402
+
+NOW = datetime.datetime.now(datetime.UTC)
+
+
+def synthetic_event(i: int) -> dict:
+    start = NOW + datetime.timedelta(days=random.randint(-3 * 365, 365))
+    return {
+        "title": f"Соревнование {i}",
+        "description": "Описание соревнования. " * random.randint(5, 50),
+        "status": random.choice(["draft", "on_consideration", "accredited", "rejected"]),
+        "discipline": [random.choice(["программирование алгоритмическое", "программирование продуктовое"])],
+        "start_date": start,
+        "end_date": start + datetime.timedelta(days=random.randint(0, 14)),
+        "age_min": random.choice([None, 10, 14]),
+        "participant_count": random.choice([None, random.randint(5, 5000)]),
+        "location": [
+            {"country": "Россия", "region": f"Регион {random.randint(1, 89)}", "city": f"Город {j}"}
+            for j in range(random.randint(1, 5))
+        ],
+        "revision": 1,
+        "updated_at": NOW,
+    }
+
+
+async def response_model_path(field) -> bytes:
+    # What `GET /events/` did before: validate documents, then FastAPI re-validates and serializes them
+    events = await Event.find_all().to_list()
+    content = await serialize_response(field=field, response_content=events)
+    return JSONResponse(content).body
+
+
+async def raw_path() -> bytes:
+    docs = await Event.get_motor_collection().find().to_list(length=None)
+    return raw_encoder(Event).dumps(docs)
+
+
+async def measure(path, repeat: int) -> tuple[float, bytes]:
+    timings = []
+    body = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = await path()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, body
+
+
+async def main(events: int, repeat: int) -> None:
+    motor_client = AsyncIOMotorClient(settings.database_uri.get_secret_value(), tz_aware=True)
+    motor_client.get_io_loop = asyncio.get_running_loop  # type: ignore[method-assign]
+    database = motor_client.get_database(f"{motor_client.get_database().name}_benchmark")
+    await motor_client.drop_database(database)
+    await init_beanie(database=database, document_models=[Event])
+
+    try:
+        print(f"➡ Generating {events} events...")
+        await Event.get_motor_collection().insert_many([synthetic_event(i) for i in range(events)])
+
+        field = create_model_field("response", list[Event], mode="serialization")
+        model_ms, model_body = await measure(lambda: response_model_path(field), repeat)
+        raw_ms, raw_body = await measure(raw_path, repeat)
+
+        print(f"{'path':<16}{'ms':>10}{'bytes':>12}")
+        print(f"{'response model':<16}{model_ms:>10.1f}{len(model_body):>12}")
+        print(f"{'raw documents':<16}{raw_ms:>10.1f}{len(raw_body):>12}")
+        if json.loads(model_body) != json.loads(raw_body):
+            print("❌ Responses differ")
+            sys.exit(1)
+        print(f"✅ Responses are equal, raw documents path is {model_ms / raw_ms:.1f}x faster")
+    finally:
+        await motor_client.drop_database(database)
+        motor_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5_000, help="number of synthetic events")
+    parser.add_argument("--repeat", type=int, default=10, help="runs of each path")
+    args = parser.parse_args()
+    asyncio.run(main(args.events, args.repeat))
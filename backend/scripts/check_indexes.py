@@ -0,0 +1,117 @@
+"""
+Run `explain()` for canonical queries of the API and fail if any of them falls back to a collection scan.
+
+Usage: `poetry run python ./scripts/check_indexes.py` (uses `database_uri` from `settings.yaml`).
+Indexes declared in documents' `Settings.indexes` are created on startup, as in the application.
+"""
+
+import asyncio
+import datetime
+import sys
+from pathlib import Path
+
+# add parent dir to sys.path
+sys.path.append(str(Path(__file__).parents[1]))
+
+from beanie import Document, PydanticObjectId  # noqa: E402
+
+from src.api.lifespan import setup_database  # noqa: E402
+from src.modules.events.repository import events_repository  # noqa: E402
+from src.modules.events.schemas import DateFilter, Filters, LocationFilter, MinMaxFilter  # noqa: E402
+from src.modules.standings.repository import _compare  # noqa: E402
+from src.storages.mongo import Event, Federation, Notify, Participant, Results  # noqa: E402
+from src.storages.mongo.events import EventStatusEnum, Gender  # noqa: E402
+from src.storages.mongo.standings import ParticipantStanding, TeamStanding  # noqa: E402
+from src.storages.mongo.trigrams import trigrams  # noqa: E402
+
+
+async def event_query(**filters) -> dict:
+    return (await events_repository._filter_query(Filters(**filters))).get_filter_query()
+
+
+async def canonical_queries() -> list[tuple[str, type[Document], dict, list[tuple[str, int]] | None]]:
+    some_id = PydanticObjectId()
+    now = datetime.datetime.now(datetime.UTC)
+    return [
+        # Events: one query per `Filters` field
+        ("events by status", Event, await event_query(status=[EventStatusEnum.ACCREDITED]), [("start_date", 1)]),
+        ("events by discipline", Event, await event_query(discipline=["программирование продуктовое"]), None),
+        ("events by host_federation", Event, await event_query(host_federation=some_id), [("start_date", 1)]),
+        ("events by start_date", Event, await event_query(date=DateFilter(start_date=now)), None),
+        ("events by end_date", Event, await event_query(date=DateFilter(end_date=now)), None),
+        ("events by date range", Event, await event_query(date=DateFilter(start_date=now, end_date=now)), None),
+        ("events by age", Event, await event_query(age=MinMaxFilter(min=10, max=14)), None),
+        ("events by min age", Event, await event_query(age=MinMaxFilter(min=10)), None),
+        ("events by participant_count", Event, await event_query(participant_count=MinMaxFilter(min=10)), None),
+        ("events by gender", Event, await event_query(gender=Gender.female), None),
+        ("events by country", Event, await event_query(location=[LocationFilter(country="Россия")]), None),
+        (
+            "events by city",
+            Event,
+            await event_query(location=[LocationFilter(country="Россия", region="г. Москва", city="Москва")]),
+            None,
+        ),
+        ("events by ids", Event, await event_query(by_ids=[some_id]), None),
+        ("events by text query", Event, await event_query(query="программирование"), None),
+        ("events by short query", Event, await event_query(query="IT"), None),
+        # Fuzzy query is narrowed to candidate ids found by the trigram index
+        ("events by fuzzy query", Event, {"trigrams": {"$in": trigrams("программирвание")}}, None),
+        ("events sorted by date", Event, {}, [("start_date", 1)]),
+        # Results
+        ("results for event", Results, {"event_id": some_id}, None),
+        ("results for solo participant", Results, {"solo_places.participant.id": some_id}, None),
+        ("results for team member", Results, {"team_places.members.id": some_id}, None),
+        ("results for participant key", Results, {"participant_keys": f"id:{some_id}"}, None),
+        ("results for team", Results, {"team_keys": {"$in": ["one zero eight"]}}, None),
+        # Participants
+        ("participants by name", Participant, {}, [("name", 1), ("_id", 1)]),
+        ("participants for federation", Participant, {"related_federation": some_id}, [("name", 1)]),
+        ("participants by name prefix", Participant, {"name_keys": {"$regex": "^иванов п"}}, None),
+        ("participants by trigrams", Participant, {"trigrams": {"$in": trigrams("Иванов")}}, None),
+        # Leaderboards: ranks of changed standings are counted by higher scores
+        ("participant standings above score", ParticipantStanding, _compare((1, 2, 0, 5), "$gt"), None),
+        ("team standings above score", TeamStanding, _compare((1, 2, 0, 5), "$gt"), None),
+        # Notifications
+        ("notifications for admin", Notify, {"for_admin": True}, None),
+        ("notifications for federation", Notify, {"for_federation": some_id}, None),
+        # Federations
+        ("federation by region", Federation, {"region": "г. Москва"}, None),
+    ]
+
+
+def stages(plan: dict | list):
+    if isinstance(plan, list):
+        for item in plan:
+            yield from stages(item)
+    elif isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from stages(value)
+
+
+async def main() -> int:
+    motor_client = await setup_database()
+    failed = 0
+    for title, document, query, sort in await canonical_queries():
+        cursor = document.get_motor_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        used = set(stages(explain["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in used:
+            failed += 1
+            print(f"❌ {title}: COLLSCAN ({query})")
+        else:
+            print(f"✅ {title}: {', '.join(sorted(used))}")
+    motor_client.close()
+
+    if failed:
+        print(f"❌ {failed} queries are not covered by indexes")
+        return 1
+    print("✅ All queries are covered by indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,108 @@
+__all__ = ["TARGETS", "rebuild_missing"]
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from beanie import Document
+
+from src.logging_ import logger
+from src.modules.events.repository import events_repository
+from src.modules.participants.repository import participant_repository
+from src.modules.results.repository import UNIQUE_PARTICIPANTS, result_repository
+from src.modules.standings.repository import standings_repository
+from src.storages.mongo import Counter, Event, Participant, Results
+from src.storages.mongo.location_facet import LocationFacet
+from src.storages.mongo.standings import ParticipantStanding, TeamStanding
+
+
+async def _exists(document: type[Document], query: dict | None = None) -> bool:
+    return await document.get_motor_collection().find_one(query or {}, {"_id": 1}) is not None
+
+
+async def _absent(document: type[Document], query: dict | None = None) -> bool:
+    return not await _exists(document, query)
+
+
+async def _empty_but(derived: type[Document], source: type[Document], query: dict | None = None) -> bool:
+    return await _absent(derived) and await _exists(source, query)
+
+
+TARGETS: dict[str, tuple[Callable[[], Awaitable[Any]], Callable[[], Awaitable[bool]], tuple[str, ...]]] = {
+    "locations": (
+        events_repository.rebuild_location_facets,
+        lambda: _empty_but(LocationFacet, Event),
+        (),
+    ),
+    "event-trigrams": (
+        events_repository.rebuild_trigrams,
+        lambda: _exists(Event, {"trigrams": {"$exists": False}}),
+        (),
+    ),
+    "event-title-keys": (
+        events_repository.rebuild_title_keys,
+        lambda: _exists(Event, {"title_key": {"$exists": False}}),
+        (),
+    ),
+    "participant-trigrams": (
+        participant_repository.rebuild_trigrams,
+        lambda: _exists(Participant, {"trigrams": {"$exists": False}}),
+        (),
+    ),
+    "participant-names": (
+        participant_repository.rebuild_name_keys,
+        lambda: _exists(Participant, {"name_keys": {"$exists": False}}),
+        (),
+    ),
+    "participant-standings": (
+        standings_repository.rebuild_participants,
+        lambda: _empty_but(
+            ParticipantStanding,
+            Results,
+            {
+                "$or": [
+                    {"solo_places.participant.id": {"$type": "objectId"}},
+                    {"team_places.members.id": {"$type": "objectId"}},
+                ]
+            },
+        ),
+        (),
+    ),
+    "result-team-keys": (
+        result_repository.rebuild_team_keys,
+        lambda: _exists(Results, {"team_keys": {"$exists": False}}),
+        (),
+    ),
+    "team-standings": (
+        standings_repository.rebuild_teams,
+        lambda: _empty_but(TeamStanding, Results, {"team_keys": {"$nin": [None, ""]}}),
+        ("result-team-keys",),
+    ),
+    "result-participant-keys": (
+        result_repository.rebuild_participant_keys,
+        lambda: _exists(Results, {"participant_keys": {"$exists": False}}),
+        (),
+    ),
+    "participant-count": (
+        result_repository.rebuild_participant_count,
+        lambda: _absent(Counter, {"name": UNIQUE_PARTICIPANTS}),
+        ("result-participant-keys",),
+    ),
+}
+"""
+Collections and fields derived from other collections and maintained incrementally by the API:
+target → (rebuild, whether it is missing, targets it is calculated from). Dependencies go first.
+"""
+
+
+async def rebuild_missing() -> list[str]:
+    """
+    Rebuild derived data that is missing in the database (e.g. it was created before the data was maintained),
+    and everything calculated from rebuilt targets. Returns rebuilt targets.
+    """
+    rebuilt: list[str] = []
+    for target, (rebuild, missing, sources) in TARGETS.items():
+        if any(source in rebuilt for source in sources) or await missing():
+            logger.info(f"Rebuilding missing derived data `{target}`")
+            await rebuild()
+            rebuilt.append(target)
+    return rebuilt
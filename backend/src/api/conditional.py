@@ -0,0 +1,93 @@
+__all__ = ["collection_etag", "document_etag", "http_date", "is_not_modified"]
+
+import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from beanie import Document, PydanticObjectId
+from fastapi import Depends, HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.api.streaming import wants_ndjson
+from src.modules.versions.repository import versions_repository
+
+
+def http_date(moment: datetime.datetime) -> str:
+    """
+    Format moment for `Last-Modified` header.
+    """
+    return format_datetime(moment.astimezone(datetime.UTC), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime.datetime | None = None) -> bool:
+    """
+    Whether the copy cached by the client is still fresh, so 304 can be answered.
+    `If-None-Match` takes precedence over `If-Modified-Since` (RFC 9110, section 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.UTC)
+        # HTTP dates have one second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _answer(request: Request, response: Response, etag: str, last_modified: datetime.datetime | None) -> None:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+def document_etag(document: type[Document], param: str = "id", field: str = "_id"):
+    """
+    Dependency for endpoints returning one `Versioned` document found by `field` equal to the path or query
+    parameter `param`. Sets strong ETag from the document revision and answers 304 when the client has it,
+    reading only the revision instead of the whole document.
+    """
+
+    async def dependency(request: Request, response: Response) -> None:
+        value = request.path_params.get(param, request.query_params.get(param))
+        if value is None or not PydanticObjectId.is_valid(value):
+            return  # validation error is raised by the endpoint itself
+        found = await document.get_motor_collection().find_one(
+            {field: PydanticObjectId(value)}, {"revision": 1, "updated_at": 1}
+        )
+        if found is None:
+            return
+        _answer(request, response, f'"{found["_id"]}-{found.get("revision", 0)}"', found.get("updated_at"))
+
+    return Depends(dependency)
+
+
+def collection_etag(document: type[Document]):
+    """
+    Dependency for endpoints returning the whole collection: ETag from the collection version counter.
+    JSON and NDJSON (chosen by `Accept` or `?stream=1`) representations get different tags. The endpoint must
+    copy headers of the injected `Response` if it returns a response object itself.
+    """
+
+    async def dependency(request: Request, response: Response) -> None:
+        version = await versions_repository.read(document)
+        # `stream` is declared by the endpoint, so it is read from the query as FastAPI parses booleans
+        stream = request.query_params.get("stream", "").lower() in ("1", "true", "on", "yes")
+        suffix = "-ndjson" if wants_ndjson(request, stream) else ""
+        response.headers["Vary"] = "Accept"
+        if version is None:
+            _answer(request, response, f'"{document.get_collection_name()}-0{suffix}"', None)
+        else:
+            _answer(request, response, f'"{version.collection}-{version.version}{suffix}"', version.updated_at)
+
+    return Depends(dependency)
@@ -0,0 +1,86 @@
+__all__ = ["CSV_MEDIA_TYPE", "XLSX_MEDIA_TYPE", "csv_response", "export_fields", "xlsx_response"]
+
+import csv
+import datetime
+import tempfile
+from collections.abc import AsyncIterable, Iterable
+from enum import Enum
+from io import StringIO
+from typing import Any
+
+from bson import ObjectId
+from openpyxl import Workbook
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+CSV_MEDIA_TYPE = "application/csv"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def export_fields(model: type[BaseModel], exclude: Iterable[str] = ()) -> list[str]:
+    """
+    Columns of an export: fields of the model in declaration order without `exclude`.
+    """
+    excluded = set(exclude)
+    return [name for name in model.model_fields if name not in excluded]
+
+
+def _attachment(filename: str) -> dict[str, str]:
+    return {"Content-Disposition": f"attachment; filename={filename}"}
+
+
+def csv_response(
+    rows: AsyncIterable[dict], fieldnames: list[str], filename: str, batch: int = 500
+) -> StreamingResponse:
+    """
+    CSV written row by row as `rows` are read from the database cursor, flushed every `batch` rows.
+    """
+
+    async def chunks():
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        written = 0
+        async for row in rows:
+            writer.writerow(row)
+            written += 1
+            if written % batch == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(chunks(), media_type=CSV_MEDIA_TYPE, headers=_attachment(filename))
+
+
+def _xlsx_cell(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        # Excel has no time zones
+        return value.astimezone(datetime.UTC).replace(tzinfo=None)
+    return value
+
+
+def xlsx_response(rows: AsyncIterable[dict], fieldnames: list[str], filename: str) -> StreamingResponse:
+    """
+    XLSX with one sheet. Rows are appended as they are read in write-only mode (openpyxl keeps them in a temporary
+    file, not in memory); the file is sent when the workbook is complete, since XLSX is a zip archive.
+    """
+
+    async def chunks():
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(fieldnames)
+        async for row in rows:
+            sheet.append([_xlsx_cell(row.get(field)) for field in fieldnames])
+        with tempfile.TemporaryFile() as f:
+            await run_in_threadpool(workbook.save, f)
+            f.seek(0)
+            while chunk := await run_in_threadpool(f.read, 64 * 1024):
+                yield chunk
+
+    return StreamingResponse(chunks(), media_type=XLSX_MEDIA_TYPE, headers=_attachment(filename))
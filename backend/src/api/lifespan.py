@@ -77,6 +77,14 @@ async def setup_database() -> AsyncIOMotorClient:
 async def lifespan(_app: FastAPI):
     # Application startup
     motor_client = await setup_database()
+    from src.api.backfill import rebuild_missing
+    from src.modules.participants.repository import participant_repository
+
+    await rebuild_missing()
+
+    if participant_repository.prefix_index is not None:
+        count = await participant_repository.prefix_index.warm()
+        logger.info(f"Participant name prefix index is warmed: {count} participants")
     file_worker_repository.create_bucket()
     asyncio.create_task(notification_loop())
     yield
@@ -0,0 +1,19 @@
+__all__ = ["FIELDS_RESPONSE", "projected_response"]
+
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import Response
+
+FIELDS_RESPONSE: dict[str, Any] = {400: {"description": "Unknown fields"}}
+
+
+def projected_response(content: Any) -> Response:
+    """
+    JSON response with projected documents. Response models declare whole documents, so documents (and models
+    containing them) are serialized by their actual classes instead of being validated against the response model.
+    """
+    if isinstance(content, BaseModel):
+        return Response(content.model_dump_json(by_alias=True, serialize_as_any=True), media_type="application/json")
+    return Response(to_json(content, by_alias=True), media_type="application/json")
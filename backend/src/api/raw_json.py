@@ -0,0 +1,86 @@
+__all__ = ["RawDocumentEncoder", "raw_encoder", "raw_json_response"]
+
+import datetime
+import functools
+import types
+from collections.abc import Mapping
+from typing import Any, Union, get_args, get_origin
+
+from bson import ObjectId
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined, to_json
+from starlette.responses import Response
+
+
+def _unwrap(annotation: Any) -> tuple[Any, bool]:
+    """
+    Inner type of `X | None`, `list[X]` and `list[X] | None`, and whether it is a list.
+    """
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        if len(args) != 1:
+            return None, False
+        annotation = args[0]
+    if get_origin(annotation) is list:
+        return get_args(annotation)[0], True
+    return annotation, False
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RawDocumentEncoder:
+    """
+    Serializer of raw documents (as returned by Motor) to the same JSON that the response model would produce,
+    without creating model instances: keys are renamed to serialization aliases, missing fields get their defaults,
+    extra and excluded fields are dropped, `ObjectId` becomes a string and `date` fields are cut from datetimes.
+    The plan for each field is computed once per model.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        # (key in the database, key in JSON, default, nested encoder, is list, is date)
+        self.fields: list[tuple[str, str, Any, RawDocumentEncoder | None, bool, bool]] = []
+        for name, field in model.model_fields.items():
+            if field.exclude:
+                continue
+            inner, is_list = _unwrap(field.annotation)
+            nested = raw_encoder(inner) if isinstance(inner, type) and issubclass(inner, BaseModel) else None
+            is_date = inner is datetime.date
+            default = None if field.default is PydanticUndefined else field.default
+            if field.default_factory is not None:
+                default = field.default_factory()
+            self.fields.append(
+                (field.alias or name, field.serialization_alias or name, default, nested, is_list, is_date)
+            )
+
+    def prepare(self, doc: dict) -> dict:
+        out = {}
+        for key, json_key, default, nested, is_list, is_date in self.fields:
+            value = doc.get(key, default)
+            if value is not None:
+                if nested is not None:
+                    value = [nested.prepare(v) for v in value] if is_list else nested.prepare(value)
+                elif is_date and isinstance(value, datetime.datetime):
+                    value = value.date()
+            out[json_key] = value
+        return out
+
+    def dumps(self, docs: list[dict]) -> bytes:
+        return to_json([self.prepare(doc) for doc in docs], fallback=_json_default)
+
+
+@functools.cache
+def raw_encoder(model: type[BaseModel]) -> RawDocumentEncoder:
+    return RawDocumentEncoder(model)
+
+
+def raw_json_response(model: type[BaseModel], docs: list[dict], headers: Mapping[str, str] | None = None) -> Response:
+    """
+    JSON list response built straight from raw documents, skipping validation and serialization through
+    the response model. Only for read-only endpoints returning documents as they are stored.
+    `headers` are copied to the response, see `ndjson_response`.
+    """
+    return Response(raw_encoder(model).dumps(docs), media_type="application/json", headers=headers)
@@ -0,0 +1,42 @@
+__all__ = ["NDJSON_MEDIA_TYPE", "NDJSON_RESPONSE", "ndjson_response", "wants_ndjson"]
+
+from collections.abc import AsyncIterable, Callable, Mapping
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+NDJSON_RESPONSE: dict[str, Any] = {
+    "content": {NDJSON_MEDIA_TYPE: {"schema": {"type": "string", "description": "One JSON object per line"}}}
+}
+"OpenAPI description of the streaming variant for `responses={200: ...}`"
+
+
+def wants_ndjson(request: Request, stream: bool = False) -> bool:
+    """
+    Client asked for streaming mode: `?stream=1` or `Accept: application/x-ndjson`.
+    """
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(
+    documents: AsyncIterable[BaseModel],
+    convert: Callable[[BaseModel], BaseModel] | None = None,
+    headers: Mapping[str, str] | None = None,
+) -> StreamingResponse:
+    """
+    Serialize documents one per line as they are read from the database cursor, so memory stays flat.
+    Documents are dumped the same way as the regular response model does it (by alias); `convert` maps
+    a document to the public model if they differ (e.g. to hide private fields). `headers` are copied
+    to the response, pass headers of the injected `Response` set by dependencies (FastAPI drops them otherwise).
+    """
+
+    async def lines():
+        async for document in documents:
+            item = convert(document) if convert is not None else document
+            yield item.model_dump_json(by_alias=True) + "\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,71 @@
+__all__ = ["CacheStats", "TTLCache"]
+
+import time
+from collections import OrderedDict
+from typing import Any
+
+from src.pydantic_base import BaseSchema
+
+
+class CacheStats(BaseSchema):
+    capacity: int
+    "Максимальное количество записей"
+    ttl: float
+    "Время жизни записи, секунды"
+    size: int
+    "Текущее количество записей"
+    hits: int
+    "Попадания"
+    misses: int
+    "Промахи"
+    evictions: int
+    "Вытесненные записи (по размеру или времени жизни)"
+    invalidations: int
+    "Полные сбросы кэша (при изменении данных)"
+
+
+class TTLCache[K, V]:
+    """
+    In-process LRU cache with time-to-live of entries and hit/miss/eviction counters.
+    """
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key: K, default: Any = None) -> V | Any:
+        entry = self._data.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._data[key]
+            self.evictions += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.invalidations += 1
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            capacity=self.capacity,
+            ttl=self.ttl,
+            size=len(self._data),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations,
+        )
@@ -70,6 +70,8 @@ class Settings(SettingBaseModel):
     "SMTP settings"
     ai: AI | None = None
     "AI settings"
+    participant_name_index: bool = False
+    "Keep an in-process prefix index of participant names for hints (warmed on startup, refreshed on participant writes). Enable only with a single worker process"
 
     @classmethod
     def from_yaml(cls, path: Path) -> "Settings":
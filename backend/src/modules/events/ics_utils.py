@@ -1,9 +1,16 @@
 import datetime
+from collections.abc import AsyncIterable, AsyncIterator
 
 import icalendar
 
+from src.storages.mongo.events import Event
+from src.storages.mongo.projection import ProjectionSchema, projection_model
+
 TIMEZONE = "Europe/Moscow"
 
+EventIcs = projection_model(Event, ("title", "description", "start_date", "end_date", "location"), "EventIcs")
+"Поля мероприятия, которые попадают в .ics"
+
 
 def get_base_calendar() -> icalendar.Calendar:
     """
@@ -34,3 +41,30 @@ def get_base_calendar() -> icalendar.Calendar:
     calendar.add_component(timezone)
 
     return calendar
+
+
+def event_to_vevent(event: Event | ProjectionSchema) -> icalendar.Event:
+    vevent = icalendar.Event()
+    vevent.add("uid", f"{str(event.id)}@innohassle.ru")
+
+    vevent.add("summary", f"{event.title}")
+    vevent.add("dtstart", icalendar.vDate(event.start_date))
+    vevent.add("dtend", icalendar.vDate(event.end_date))
+    vevent.add("description", event.description)
+    if event.location:
+        vevent.add("location", "\n".join([str(loc) for loc in event.location]))
+    return vevent
+
+
+async def render_calendar(
+    calendar: icalendar.Calendar, events: AsyncIterable[Event | ProjectionSchema]
+) -> AsyncIterator[bytes]:
+    """
+    Serialize calendar chunk by chunk: its properties and timezone first, then one VEVENT per event as they come.
+    """
+    head = calendar.to_ical()
+    end = head.rindex(b"END:VCALENDAR")
+    yield head[:end]
+    async for event in events:
+        yield event_to_vevent(event).to_ical()
+    yield head[end:]
@@ -1,40 +1,177 @@
 __all__ = ["events_repository"]
 
+import datetime
+import hashlib
+import json
+import re
+from collections import Counter
+from collections.abc import AsyncIterator
+from typing import Literal
+from zoneinfo import ZoneInfo
+
 from beanie import PydanticObjectId
-from beanie.odm.operators.find.comparison import GTE, LTE, Eq, In
-from beanie.odm.operators.find.logical import And, Nor, Or
+from beanie.odm.operators.find.comparison import Eq, In
+from beanie.odm.operators.find.logical import And, Or
+from beanie.odm.queries.find import FindMany
+from pydantic import BaseModel
+from pymongo import UpdateOne
 
+from src.cache import CacheStats, TTLCache
+from src.modules.events.ics_utils import TIMEZONE
 from src.modules.events.schemas import (
     Filters,
     Pagination,
     Sort,
     SortingCriteria,
 )
-from src.storages.mongo.events import Event, EventSchema, EventStatusEnum
+from src.modules.versions.repository import versions_repository
+from src.storages.mongo.events import Event, EventLocation, EventSchema, EventStatusEnum
+from src.storages.mongo.keyset import decode_cursor, encode_cursor, keyset_match
+from src.storages.mongo.location_facet import LocationFacet
+from src.storages.mongo.projection import ProjectionSchema
+from src.storages.mongo.ranges import overlap_query
 from src.storages.mongo.selection import Selection
+from src.storages.mongo.trigrams import (
+    fuzzy_ids,
+    normalize_text,
+    rebuild_derived,
+    rebuild_trigrams,
+    trigram_similarity,
+    trigrams,
+)
+from src.storages.mongo.versioning import revised
+
+MIN_TEXT_QUERY_LENGTH = 3
+"Более короткие запросы ищутся по началу названия, а не через текстовый индекс"
 
 
 # noinspection PyMethodMayBeStatic
 class EventsRepository:
+    version: int
+    "Версия коллекции событий в этом процессе, увеличивается при каждом изменении"
+
+    def __init__(
+        self,
+        search_cache_size: int = 256,
+        search_cache_ttl: float = 60,
+        ics_cache_size: int = 64,
+        ics_cache_ttl: float = 3600,
+    ):
+        self.version = 0
+        # Pages of `search` and facet counts. Default order depends on the current moment, so results are not cached
+        # for long even without writes
+        self._search_cache: TTLCache[str, tuple] = TTLCache(search_cache_size, search_cache_ttl)
+        self._facets_cache: TTLCache[str, dict[str, list[dict]]] = TTLCache(search_cache_size, search_cache_ttl)
+        # Rendered .ics feeds of selections, dropped on every write to events
+        self.ics_cache: TTLCache[str, bytes] = TTLCache(ics_cache_size, ics_cache_ttl)
+
     async def read_one(self, id: PydanticObjectId) -> Event | None:
         return await Event.get(id)
 
     async def read_all(self) -> list[Event] | None:
         return await Event.all().to_list()
 
-    async def read_all_locations(self) -> list:
-        s = await Event.get_motor_collection().aggregate([{"$project": {"location": 1}}]).to_list()
-        s = [i["location"] for i in s]
-        return s
+    async def read_all_raw(self) -> list[dict]:
+        """
+        All documents as stored, without validation (for `raw_json_response`).
+        """
+        return await Event.get_motor_collection().find().to_list(length=None)
+
+    def iterate_all(self, batch_size: int = 500) -> FindMany[Event]:
+        return Event.all(batch_size=batch_size)
+
+    async def read_location_facets(self) -> list[LocationFacet]:
+        return await LocationFacet.find().sort("country", "region", "city").to_list()
+
+    async def rebuild_location_facets(self) -> None:
+        """
+        Recalculate `LocationFacet` collection from all events (backfill).
+        """
+        await Event.aggregate(
+            [
+                {"$unwind": "$location"},
+                # Each place is counted once per event
+                {
+                    "$group": {
+                        "_id": {
+                            "event": "$_id",
+                            "country": "$location.country",
+                            "region": {"$ifNull": ["$location.region", None]},
+                            "city": {"$ifNull": ["$location.city", None]},
+                        }
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": {"country": "$_id.country", "region": "$_id.region", "city": "$_id.city"},
+                        "events": {"$sum": 1},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "country": "$_id.country",
+                        "region": "$_id.region",
+                        "city": "$_id.city",
+                        "events": 1,
+                    }
+                },
+                {"$out": LocationFacet.get_collection_name()},
+            ]
+        ).to_list()
+
+    async def _update_location_facets(
+        self, removed: list[list[EventLocation]], added: list[list[EventLocation]]
+    ) -> None:
+        delta = Counter()
+        for locations in removed:
+            for place in {(loc.country, loc.region, loc.city) for loc in locations}:
+                delta[place] -= 1
+        for locations in added:
+            for place in {(loc.country, loc.region, loc.city) for loc in locations}:
+                delta[place] += 1
+
+        operations = [
+            UpdateOne({"country": country, "region": region, "city": city}, {"$inc": {"events": n}}, upsert=True)
+            for (country, region, city), n in delta.items()
+            if n
+        ]
+        if operations:
+            collection = LocationFacet.get_motor_collection()
+            await collection.bulk_write(operations, ordered=False)
+            await collection.delete_many({"events": {"$lte": 0}})
+
+    def _to_document(self, event: EventSchema) -> Event:
+        document = Event.model_validate(event, from_attributes=True)
+        document.trigrams = trigrams(event.title)
+        document.title_key = normalize_text(event.title)
+        return document.revise()
+
+    async def rebuild_trigrams(self) -> None:
+        """
+        Recalculate `trigrams` of all events (backfill).
+        """
+        await rebuild_trigrams(Event, "title")
+
+    async def rebuild_title_keys(self) -> None:
+        """
+        Recalculate `title_key` of all events (backfill).
+        """
+        await rebuild_derived(Event, "title", "title_key", lambda title: normalize_text(title or ""))
 
     async def create_many(self, events: list[EventSchema]) -> bool:
-        res = await Event.insert_many([Event.model_validate(event, from_attributes=True) for event in events])
+        res = await Event.insert_many([self._to_document(event) for event in events])
+        await self._bump_version()
+        await self._update_location_facets(removed=[], added=[event.location for event in events])
         if not res.acknowledged:
             return False
         return True
 
     async def suggest(self, event: EventSchema) -> Event:
-        return await Event.model_validate(event, from_attributes=True).insert()
+        created = await self._to_document(event).insert()
+        await self._bump_version()
+        await self._update_location_facets(removed=[], added=[created.location])
+        return created
 
     async def accredite(
         self, id_: PydanticObjectId, status: EventStatusEnum, status_comment: str | None
@@ -44,7 +181,8 @@ class EventsRepository:
             return None
         event.status = status
         event.status_comment = status_comment
-        await event.save()
+        await event.revise().save()
+        await self._bump_version()
         return event
 
     async def get_random_event(self) -> Event | None:
@@ -55,61 +193,238 @@ class EventsRepository:
         ).to_list(length=1)
         return random_docs[0] if random_docs else None
 
-    async def read_with_filters(
-        self, filters: Filters, sort: Sort | None, pagination: Pagination | None, count: bool = False
-    ) -> list[Event] | int:
+    async def search(
+        self,
+        filters: Filters,
+        sort: Sort | None,
+        pagination: Pagination | None,
+        projection: type[ProjectionSchema] | None = None,
+    ) -> tuple[list[Event] | list[ProjectionSchema], int, str | None]:
+        """
+        Page of filtered events, total number of matched events and cursor of the next page.
+        Page and total are computed in one aggregation; items are skipped when `pagination.page_size` is 0.
+        With `projection` only its fields are read from the database and items are instances of it.
+
+        :raises ValueError: if `pagination.cursor` is malformed
+        """
+        fields = sorted(projection.model_fields) if projection else None
+        key = self._cache_key("search", filters, sort, pagination, fields)
+        cached = self._search_cache.get(key)
+        if cached is None:
+            cached = await self._search(filters, sort, pagination, projection)
+            self._search_cache.set(key, cached)
+        return cached
+
+    def search_cache_stats(self) -> CacheStats:
+        """
+        Counters of the cache of `search`.
+        """
+        return self._search_cache.stats()
+
+    def _cache_key(self, method: str, *args: BaseModel | bool | list[str] | None) -> str:
+        # Filters may be modified while building the query, so key is computed beforehand
+        canonical = [method, self.version] + [
+            a.model_dump(mode="json") if isinstance(a, BaseModel) else a for a in args
+        ]
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    async def _bump_version(self) -> None:
+        await versions_repository.bump(Event)
+        self.version += 1
+        self._search_cache.clear()
+        self._facets_cache.clear()
+        self.ics_cache.clear()
+
+    async def _search(
+        self,
+        filters: Filters,
+        sort: Sort | None,
+        pagination: Pagination | None,
+        projection: type[ProjectionSchema] | None,
+    ) -> tuple[list[Event] | list[ProjectionSchema], int, str | None]:
+        query = await self._filter_query(filters)
+        sort = self._effective_sort(sort, filters)
+        model = projection or Event
+
+        score = self._score(filters)
+
+        if pagination and pagination.cursor:
+            return await self._search_after_cursor(query, sort, pagination, projection, score)
+
+        now_ = datetime.datetime.now(datetime.UTC)
+        facets = {"total": [{"$count": "count"}]}
+
+        if pagination is None or pagination.page_size > 0:
+            items = self._order_stages(sort, now_, score=score)
+            if pagination:
+                items.append({"$skip": pagination.page_size * (pagination.page_no - 1)})
+                items.append({"$limit": pagination.page_size})
+            items.extend(self._project_stages(sort, projection))
+            facets["items"] = items
+
+        result = await query.aggregate([{"$facet": facets}]).to_list()
+        facet = result[0] if result else {}
+        docs = facet.get("items", [])
+        total = facet["total"][0]["count"] if facet.get("total") else 0
+
+        next_cursor = None
+        if pagination and docs and pagination.page_size * (pagination.page_no - 1) + len(docs) < total:
+            next_cursor = self._cursor_after(sort, now_, docs[-1])
+        return [model.model_validate(doc) for doc in docs], total, next_cursor
+
+    async def _search_after_cursor(
+        self,
+        query: FindMany[Event],
+        sort: Sort | None,
+        pagination: Pagination,
+        projection: type[ProjectionSchema] | None,
+        score: dict,
+    ) -> tuple[list[Event] | list[ProjectionSchema], int, str | None]:
+        state = decode_cursor(pagination.cursor)
+        if pagination.page_size <= 0:
+            # Only the total is requested, as for page numbers
+            return [], await query.count(), None
+        # Default order depends on the current moment, so the whole walk uses the moment of the first page
+        now_ = state.get("now") or datetime.datetime.now(datetime.UTC)
+        pipeline = self._order_stages(sort, now_, after=state["key"], score=score)
+        pipeline.append({"$limit": pagination.page_size + 1})
+        pipeline.extend(self._project_stages(sort, projection))
+
+        docs = await query.aggregate(pipeline).to_list()
+        total = await query.count()
+
+        next_cursor = None
+        if len(docs) > pagination.page_size:
+            docs = docs[: pagination.page_size]
+            next_cursor = self._cursor_after(sort, now_, docs[-1])
+        return [(projection or Event).model_validate(doc) for doc in docs], total, next_cursor
+
+    async def iterate_search(
+        self, filters: Filters, sort: Sort | None, projection: type[ProjectionSchema] | None = None
+    ) -> AsyncIterator[Event | ProjectionSchema]:
+        """
+        All filtered events in search order, without page limit. Events are read lazily from the database cursor.
+        """
+        query = await self._filter_query(filters)
+        sort = self._effective_sort(sort, filters)
+        pipeline = self._order_stages(sort, datetime.datetime.now(datetime.UTC), score=self._score(filters))
+        pipeline.extend(self._project_stages(sort, projection))
+        model = projection or Event
+        async for doc in query.aggregate(pipeline):
+            yield model.model_validate(doc)
+
+    async def count_by_period(
+        self,
+        filters: Filters,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        unit: Literal["month", "week"] = "month",
+        tz: str = TIMEZONE,
+    ) -> dict[datetime.datetime, int]:
+        """
+        Histogram of filtered events by start date in one aggregation: {period start (in `tz`): count}.
+        Periods in [start, end) without events are filled with zeros. Events are also limited by `filters.date`,
+        so a bound given by the caller is kept when the range is wider.
+        """
+        zone = ZoneInfo(tz)
+        start = start if start.tzinfo else start.replace(tzinfo=zone)
+        end = end if end.tzinfo else end.replace(tzinfo=zone)
+
+        query = await self._filter_query(filters)
+        query = query.find({"start_date": {"$gte": start, "$lt": end}})
+        truncate = {"date": "$start_date", "unit": unit, "timezone": tz}
+        if unit == "week":
+            truncate["startOfWeek"] = "monday"
+        groups = await query.aggregate([{"$group": {"_id": {"$dateTrunc": truncate}, "count": {"$sum": 1}}}]).to_list()
+        found = {group["_id"].astimezone(zone): group["count"] for group in groups}
+
+        counts = {}
+        period = start.astimezone(zone).replace(hour=0, minute=0, second=0, microsecond=0)
+        if unit == "month":
+            period = period.replace(day=1)
+        else:
+            period -= datetime.timedelta(days=period.weekday())
+        while period < end:
+            counts[period] = found.get(period, 0)
+            if unit == "month":
+                period = period.replace(year=period.year + period.month // 12, month=period.month % 12 + 1)
+            else:
+                period += datetime.timedelta(days=7)
+        return counts
+
+    async def count_facets(self, filters: Filters) -> dict[str, list[dict]]:
+        """
+        Number of filtered events per discipline, region, status, level, gender and month of start in one
+        aggregation: {facet: [{"value": ..., "count": ...}]}. Each facet ignores the filter on its own dimension.
+        """
+        key = self._cache_key("count_facets", filters)
+        cached = self._facets_cache.get(key)
+        if cached is None:
+            cached = await self._count_facets(filters)
+            self._facets_cache.set(key, cached)
+        return cached
+
+    async def _count_facets(self, filters: Filters) -> dict[str, list[dict]]:
+        # facet: (filter on the same dimension, value expression, whether value is an array)
+        facets = {
+            "discipline": ("discipline", {"$setUnion": ["$discipline", []]}, True),
+            "region": ("location", {"$setUnion": [{"$ifNull": ["$location.region", []]}, []]}, True),
+            "status": ("status", "$status", False),
+            "level": (None, "$level", False),
+            "gender": ("gender", "$gender", False),
+            "month": (
+                "date",
+                {"$dateToString": {"format": "%Y-%m", "date": "$start_date", "timezone": TIMEZONE}},
+                False,
+            ),
+        }
+        dimensions = {dimension for dimension, _, _ in facets.values() if dimension}
+        base = filters.model_copy(update={dimension: None for dimension in dimensions})
+
+        stages = {}
+        for facet, (own, value, is_array) in facets.items():
+            others = Filters(**{d: getattr(filters, d) for d in dimensions if d != own})
+            match = (await self._filter_query(others)).get_filter_query()
+            pipeline = [{"$match": match}] if match else []
+            pipeline.append({"$project": {"value": value}})
+            if is_array:
+                pipeline.append({"$unwind": "$value"})
+            pipeline.append({"$group": {"_id": "$value", "count": {"$sum": 1}}})
+            pipeline.append({"$sort": {"count": -1, "_id": 1}})
+            pipeline.append({"$project": {"_id": 0, "value": "$_id", "count": 1}})
+            stages[facet] = pipeline
+
+        result = await (await self._filter_query(base)).aggregate([{"$facet": stages}]).to_list()
+        return result[0] if result else {facet: [] for facet in facets}
+
+    async def _filter_query(self, filters: Filters) -> FindMany[Event]:
         if filters.by_ids:
-            query = Event.find({"_id": {"$in": filters.by_ids}})
-            if count:
-                return await query.count()
-            return await query.to_list()
+            return Event.find({"_id": {"$in": filters.by_ids}})
 
-        query = Event.all()
+        query = Event.find()
 
         # Apply filters
         if filters.age:
-            # FIXME: Может работать неверно, если у событий не указан возраст
-            filters.age.min = filters.age.min or 0
-            filters.age.max = filters.age.max or 100
+            # Событие без ограничения возраста подходит под любой фильтр
             query = query.find(
-                (filters.age.min <= Event.age_min <= filters.age.max)
-                or (filters.age.min <= Event.age_max <= filters.age.max)
-                or (filters.age.min >= Event.age_min and Event.age_max <= filters.age.max)
-                or (filters.age.min >= Event.age_min and filters.age.max <= Event.age_max)
-                or (Event.age_min == None and Event.age_max >= filters.age.min)  # noqa: E711
-                or (Event.age_min == None and Event.age_max >= filters.age.max)  # noqa: E711
-                or (Event.age_max == None and Event.age_min <= filters.age.min)  # noqa: E711
-                or (Event.age_max == None and Event.age_min <= filters.age.max)  # noqa: E711
-                or (Event.age_min == None and Event.age_max == None)  # noqa: E711
+                overlap_query("age_min", "age_max", filters.age.min, filters.age.max, nulls_unbounded=True)
             )
         if filters.participant_count:
-            if filters.participant_count.min is not None and filters.participant_count.max is not None:
-                query = query.find(
-                    GTE(Event.participant_count, filters.participant_count.min),
-                    LTE(Event.participant_count, filters.participant_count.max),
+            query = query.find(
+                overlap_query(
+                    "participant_count",
+                    "participant_count",
+                    filters.participant_count.min,
+                    filters.participant_count.max,
                 )
-            elif filters.participant_count.min is not None:
-                query = query.find(GTE(Event.participant_count, filters.participant_count.min))
-            elif filters.participant_count.max is not None:
-                query = query.find(LTE(Event.participant_count, filters.participant_count.max))
+            )
         if filters.gender is not None:
             query = query.find(Or(Event.gender == filters.gender, Event.gender == None))  # noqa: E711
 
         if filters.date:
-            if filters.date.start_date is not None and filters.date.end_date is not None:
-                query = query.find(
-                    Nor(
-                        And(filters.date.start_date < Event.start_date, filters.date.end_date < Event.start_date),
-                        And(filters.date.start_date > Event.end_date, filters.date.end_date > Event.end_date),
-                    )
-                )
-            elif filters.date.start_date is not None:
-                query = query.find(Event.end_date >= filters.date.start_date)
-            elif filters.date.end_date is not None:
-                query = query.find(Event.start_date <= filters.date.end_date)
+            # Событие хотя бы частично проходит в заданный период
+            query = query.find(overlap_query("start_date", "end_date", filters.date.start_date, filters.date.end_date))
 
-        if filters.date and filters.date.end_date is not None:
-            query = query.find(Event.end_date <= filters.date.end_date)
         if filters.discipline:
             query = query.find(In(Event.discipline, filters.discipline))
         if filters.status:
@@ -137,28 +452,115 @@ class EventsRepository:
             query = query.find({"host_federation": filters.host_federation})
 
         if filters.query:
-            query = query.find({"title": {"$regex": filters.query, "$options": "i"}})
+            if filters.fuzzy:
+                # Only the most similar candidates are narrowed by the other filters
+                query = query.find({"_id": {"$in": await fuzzy_ids(Event, "trigrams", filters.query)}})
+            elif self._uses_text_index(filters):
+                query = query.find({"$text": {"$search": filters.query, "$language": "russian"}})
+            elif prefix := normalize_text(filters.query):
+                # Слишком короткий запрос для стемминга: ищем по началу названия (регистрозависимый якорный regex
+                # по нормализованному названию - диапазон индекса)
+                query = query.find({"title_key": {"$regex": f"^{re.escape(prefix)}"}})
 
-        if count:
-            return await query.count()
+        return query
 
-        if sort:
-            if sort.type == SortingCriteria.date:
-                query = query.sort(("start_date", sort.direction))
-            elif sort.type == SortingCriteria.date:
-                query = query.sort(("age_min", sort.direction))
-            elif sort.type == SortingCriteria.date:
-                query = query.sort(("participant_count", sort.direction))
+    def _uses_text_index(self, filters: Filters) -> bool:
+        return (
+            bool(filters.query)
+            and len(filters.query.strip()) >= MIN_TEXT_QUERY_LENGTH
+            and not filters.fuzzy
+            and not filters.by_ids
+        )
 
-        if pagination:
-            query = query.skip(pagination.page_size * (pagination.page_no - 1)).limit(pagination.page_size)
+    def _uses_trigrams(self, filters: Filters) -> bool:
+        return bool(filters.query) and filters.fuzzy and not filters.by_ids
 
-        # Return results
-        return await query.to_list()
+    def _effective_sort(self, sort: Sort | None, filters: Filters) -> Sort | None:
+        # Relevance is known only for text and fuzzy search, otherwise fall back to the default order
+        if (
+            sort
+            and sort.type == SortingCriteria.relevance
+            and not (self._uses_text_index(filters) or self._uses_trigrams(filters))
+        ):
+            return None
+        return sort
+
+    def _score(self, filters: Filters) -> dict:
+        # Relevance of the query: trigram similarity for fuzzy search, text score otherwise
+        if self._uses_trigrams(filters):
+            return trigram_similarity("trigrams", trigrams(filters.query))
+        return {"$meta": "textScore"}
+
+    def _sort_keys(self, sort: Sort | None) -> tuple[list[tuple[str, int]], bool]:
+        """
+        Sort keys (always ending with `_id` for a stable order) and whether they are computed or nullable.
+        """
+        if sort is None or sort.type == SortingCriteria.default:
+            return [("_bucket", 1), ("_distance", 1), ("_id", 1)], True
+        if sort.type == SortingCriteria.relevance:
+            return [("_score", -1), ("_id", 1)], True
+        if sort.type == SortingCriteria.date:
+            return [("start_date", sort.direction), ("_id", 1)], False
+        if sort.type == SortingCriteria.age:
+            return [("age_min", sort.direction), ("_id", 1)], True
+        return [("participant_count", sort.direction), ("_id", 1)], True
+
+    def _order_stages(
+        self, sort: Sort | None, now_: datetime.datetime, after: list | None = None, score: dict | None = None
+    ) -> list[dict]:
+        stages = []
+        if sort is None or sort.type == SortingCriteria.default:
+            # Сначала текущие события, потом будущие, потом прошедшие; внутри группы - ближайшие к текущему моменту
+            current = {"$and": [{"$lt": ["$start_date", now_]}, {"$lt": [now_, "$end_date"]}]}
+            future = {"$gt": ["$start_date", now_]}
+            past = {"$and": [{"$lt": ["$end_date", now_]}, {"$lt": ["$start_date", now_]}]}
+            stages.append(
+                {
+                    "$addFields": {
+                        "_bucket": {
+                            "$switch": {
+                                "branches": [
+                                    {"case": current, "then": 1},
+                                    {"case": future, "then": 2},
+                                    {"case": past, "then": 3},
+                                ],
+                                "default": 4,
+                            }
+                        },
+                        "_distance": {"$abs": {"$subtract": [now_, "$start_date"]}},
+                    }
+                }
+            )
+        elif sort.type == SortingCriteria.relevance:
+            stages.append({"$addFields": {"_score": score or {"$meta": "textScore"}}})
+
+        keys, expr = self._sort_keys(sort)
+        if after is not None:
+            stages.append({"$match": keyset_match(keys, after, expr=expr)})
+        stages.append({"$sort": dict(keys)})
+        return stages
+
+    def _project_stages(self, sort: Sort | None, projection: type[ProjectionSchema] | None) -> list[dict]:
+        if projection is None:
+            return []
+        # Sort keys are kept for the cursor of the next page
+        keys, _ = self._sort_keys(sort)
+        return [{"$project": projection.projection() | {field: 1 for field, _ in keys}}]
+
+    def _cursor_after(self, sort: Sort | None, now_: datetime.datetime, doc: dict) -> str:
+        keys, _ = self._sort_keys(sort)
+        state = {"key": [doc.get(field) for field, _ in keys]}
+        if sort is None or sort.type == SortingCriteria.default:
+            state["now"] = now_
+        return encode_cursor(state)
 
     async def read_for_federation(self, federation_id: PydanticObjectId) -> list[Event]:
         return await Event.find({"host_federation": federation_id}).to_list()
 
+    async def read_ids_with_filters(self, filters: Filters) -> list[PydanticObjectId]:
+        docs = await (await self._filter_query(filters)).aggregate([{"$project": {"_id": 1}}]).to_list()
+        return [doc["_id"] for doc in docs]
+
     async def read_for_federation_only_ids(self, federation_id: PydanticObjectId) -> list[PydanticObjectId]:
         _ = await Event.find({"host_federation": federation_id}).aggregate([{"$project": {"_id": 1}}]).to_list()
         return [i["_id"] for i in _]
@@ -172,7 +574,21 @@ class EventsRepository:
         return await Selection.get(id_)
 
     async def update(self, id: PydanticObjectId, event: EventSchema) -> Event | None:
-        await Event.find_one(Event.id == id).update({"$set": event.model_dump()})
+        was = await Event.get(id)
+        await Event.find_one(Event.id == id).update(
+            revised(
+                {
+                    "$set": {
+                        **event.model_dump(),
+                        "trigrams": trigrams(event.title),
+                        "title_key": normalize_text(event.title),
+                    }
+                }
+            )
+        )
+        await self._bump_version()
+        if was is not None:
+            await self._update_location_facets(removed=[was.location], added=[event.location])
         return await Event.get(id)
 
 
@@ -5,27 +5,33 @@ from typing import Literal
 
 import bs4
 import httpx
-import icalendar
 import magic
 import pandas as pd
 import pdfplumber
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Body, HTTPException, UploadFile
-from pydantic import BaseModel
-from starlette.responses import Response
+from fastapi import APIRouter, Body, HTTPException, Request, UploadFile
+from pydantic import BaseModel, Field
+from starlette.responses import Response, StreamingResponse
 
+from src.api.conditional import document_etag, http_date, is_not_modified
 from src.api.dependencies import USER_AUTH
+from src.api.projection import projected_response
+from src.api.raw_json import raw_json_response
+from src.api.streaming import NDJSON_RESPONSE, ndjson_response, wants_ndjson
+from src.cache import CacheStats
 from src.logging_ import logger
 from src.modules.ai.repository import ai_repository
-from src.modules.events.ics_utils import get_base_calendar
+from src.modules.events.ics_utils import EventIcs, get_base_calendar, render_calendar
 from src.modules.events.repository import events_repository
-from src.modules.events.schemas import DateFilter, Filters, Pagination, Sort, SortingCriteria
+from src.modules.events.schemas import Filters, Pagination, Sort
 from src.modules.federation.repository import federation_repository
 from src.modules.notify.repository import notify_repository
 from src.modules.participants.repository import participant_repository
 from src.modules.users.repository import user_repository
+from src.modules.versions.repository import versions_repository
 from src.pydantic_base import BaseSchema
 from src.storages.mongo.events import (
+    EVENT_PROJECTIONS,
     Disciplines,
     Event,
     EventLocation,
@@ -33,9 +39,11 @@ from src.storages.mongo.events import (
     EventStatusEnum,
 )
 from src.storages.mongo.notify import AccreditationRequestEvent, AccreditedEvent, NotifySchema
-from src.storages.mongo.results import Results, TeamPlace
+from src.storages.mongo.projection import resolve_projection
+from src.storages.mongo.results import ResultsSchema, TeamPlace
 from src.storages.mongo.selection import Selection
 from src.storages.mongo.users import UserRole
+from src.storages.mongo.versioning import Versioned
 
 router = APIRouter(prefix="/events", tags=["Events"])
 
@@ -45,12 +53,23 @@ async def get_random_event() -> Event:
     return await events_repository.get_random_event()
 
 
-@router.get("/", responses={200: {"description": "Info about all events"}})
-async def get_all_events() -> list[Event]:
+@router.get("/", responses={200: {"description": "Info about all events", **NDJSON_RESPONSE}})
+async def get_all_events(request: Request, stream: bool = False) -> list[Event]:
     """
     Get info about all events.
+
+    With `Accept: application/x-ndjson` or `?stream=1` events are streamed one per line as they are read.
     """
-    return await events_repository.read_all()
+    if wants_ndjson(request, stream):
+        return ndjson_response(events_repository.iterate_all())
+    return raw_json_response(Event, await events_repository.read_all_raw())
+
+
+class HintResults(ResultsSchema, Versioned):
+    id: PydanticObjectId = Field(default_factory=PydanticObjectId)
+    "Временный ID (результаты ещё не сохранены)"
+    ambiguous_names: dict[str, list[PydanticObjectId]] = {}
+    "ФИО из протокола, которым соответствует несколько участников: такие участники не сопоставлены"
 
 
 @router.post(
@@ -60,7 +79,7 @@ async def get_all_events() -> list[Event]:
         400: {"description": "Cannot parse file"},
     },
 )
-async def hint_results(file: UploadFile) -> Results:
+async def hint_results(file: UploadFile) -> HintResults:
     bytes_ = await file.read()
     mime_type = magic.from_buffer(bytes_, mime=True)
 
@@ -114,10 +133,9 @@ async def hint_results(file: UploadFile) -> Results:
     place_column = next((c for c in df.columns if is_place_column(c)), None)
     score_column = next((c for c in df.columns[::-1] if is_score_column(c)), None)
     team_column = next((c for c in df.columns if is_team_column(c)), None)
-    name_x_id = await participant_repository.name_x_id()
 
     if team_column:
-        team_places = []
+        rows = []
         for i, row in df.iterrows():
             team: str = row[team_column]  # one-zero-eight (Булгаков, Авхадеев, Бельков, Дерябкин, Полин)
             member_sub = re.findall(r"\((.*?)\)", team)
@@ -126,20 +144,28 @@ async def hint_results(file: UploadFile) -> Results:
                 members = member_sub[-1].replace("(", "").replace(")", "").split(",")
                 members = [m.strip() for m in members]
                 members = [m for m in members if m]
-                members = [{"id": name_x_id.get(m), "name": m} for m in members]
             else:
                 members = []
+            rows.append((row, team, members))
 
+        # Resolve all distinct member names at once, ambiguous ones are left without id
+        name_x_ids = await participant_repository.resolve_names({m for _, _, members in rows for m in members})
+        ambiguous_names = {name: ids for name, ids in name_x_ids.items() if len(ids) > 1}
+
+        team_places = []
+        for row, team, members in rows:
             team_places.append(
                 TeamPlace(
                     place=row[place_column] if place_column else len(team_places) + 1,
                     team=team.strip(),
-                    members=members,
+                    members=[{"id": name_x_ids[m][0] if len(name_x_ids[m]) == 1 else None, "name": m} for m in members],
                     score=row[score_column] if score_column else None,
                 )
             )
 
-        return Results(team_places=team_places, event_id=PydanticObjectId(), event_title="")
+        return HintResults(
+            team_places=team_places, event_id=PydanticObjectId(), event_title="", ambiguous_names=ambiguous_names
+        )
     else:
         raise HTTPException(status_code=400, detail="Cannot parse file (no team column)")
 
@@ -301,79 +327,128 @@ class SearchEventsResponse(BaseModel):
     events: list[Event]
     "Результат поиска"
 
+    next_cursor: str | None = None
+    "Курсор следующей страницы (None - страниц больше нет)"
 
-@router.post("/search", responses={200: {"description": "Search events"}})
+
+@router.post(
+    "/search",
+    responses={200: {"description": "Search events"}, 400: {"description": "Invalid cursor, fields or page size"}},
+)
 async def search_events(
-    filters: Filters, sort: Sort | None = None, pagination: Pagination | None = None
+    filters: Filters, sort: Sort | None = None, pagination: Pagination | None = None, fields: str | None = None
 ) -> SearchEventsResponse:
     """
     Search events.
+
+    `fields` limits fields of found events: a preset (`card`, `calendar`) or comma-separated field names.
     """
-    events = await events_repository.read_with_filters(filters, sort, pagination)
+    try:
+        projection = resolve_projection(Event, EVENT_PROJECTIONS, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if pagination and pagination.page_size <= 0:
+        raise HTTPException(status_code=400, detail="Page size must be positive")
+    try:
+        events, total, next_cursor = await events_repository.search(filters, sort, pagination, projection)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     if pagination:
-        total = await events_repository.read_with_filters(filters, sort=None, pagination=None, count=True)
         total_pages = (total + pagination.page_size - 1) // pagination.page_size
     else:
         total_pages = 1
 
-    now_ = datetime.datetime.now(datetime.UTC)
-
-    def key(event: Event):
-        if event.end_date < now_ and event.start_date < now_:  # past
-            return 3, abs((now_ - event.start_date).total_seconds())
-
-        if event.start_date > now_:  # future
-            return 2, abs((now_ - event.start_date).total_seconds())
-
-        if event.start_date < now_ < event.end_date:  # current
-            return 1, abs((now_ - event.start_date).total_seconds())
-
-        return 4, abs((now_ - event.start_date).total_seconds())  # ?
-
-    if sort is None or sort.type == SortingCriteria.default:
-        events.sort(key=key)
-
+    if projection:
+        return projected_response(
+            SearchEventsResponse.model_construct(
+                filters=filters,
+                sort=sort,
+                pagination=pagination,
+                pages_total=total_pages,
+                events=events,
+                next_cursor=next_cursor,
+            )
+        )
     return SearchEventsResponse(
         filters=filters,
         sort=sort,
         pagination=pagination,
         pages_total=total_pages,
         events=events,
+        next_cursor=next_cursor,
     )
 
 
+@router.get("/search/cache", responses={200: {"description": "Search cache statistics"}})
+async def get_search_cache_stats() -> CacheStats:
+    """
+    Hit/miss/eviction counters of the in-process cache of search pages and counts (for sizing it).
+    """
+    return events_repository.search_cache_stats()
+
+
 @router.post("/search/count", responses={200: {"description": "Count events"}})
 async def count_events(filters: Filters) -> int:
     """
     Count filtered events.
     """
-    count = await events_repository.read_with_filters(filters, None, Pagination(page_size=0, page_no=0), count=True)
+    _, count, _ = await events_repository.search(filters, None, Pagination(page_size=0, page_no=0))
     return count
 
 
-@router.post("/search/count-by-month", responses={200: {"description": "Count events by months"}})
-async def count_events_by_month(filters: Filters) -> dict[str, int]:
+class FacetCount(BaseModel):
+    value: str | None
+    "Значение (None - не указано)"
+    count: int
+    "Количество событий"
+
+
+class SearchFacetsResponse(BaseModel):
+    discipline: list[FacetCount]
+    "По дисциплинам"
+    region: list[FacetCount]
+    "По регионам проведения"
+    status: list[FacetCount]
+    "По статусам"
+    level: list[FacetCount]
+    "По уровням мероприятия"
+    gender: list[FacetCount]
+    "По полу участников"
+    month: list[FacetCount]
+    "По месяцам начала (YYYY-MM, московское время)"
+
+
+@router.post("/search/facets", responses={200: {"description": "Count events by filter options"}})
+async def count_events_facets(filters: Filters) -> SearchFacetsResponse:
     """
-    Count filtered events by months.
+    Count filtered events for every option of discipline, region, status, level, gender and month.
+    Each facet ignores the filter on its own dimension, so counts show what selecting an option would give.
     """
+    facets = await events_repository.count_facets(filters)
+    return SearchFacetsResponse.model_validate(facets)
+
 
-    counts = {}
-    if filters.date and filters.date.start_date:
-        current_year = filters.date.start_date.year
+@router.post("/search/count-by-month", responses={200: {"description": "Count events by months"}})
+async def count_events_by_month(filters: Filters, period: Literal["month", "week"] = "month") -> dict[str, int]:
+    """
+    Count filtered events by months (or weeks) of their start in Moscow time.
+
+    Range is taken from `filters.date`: both dates - arbitrary range, only start date - its year,
+    otherwise the current year; events are still limited by the given date. Keys are `YYYY-MM` for months
+    and `YYYY-MM-DD` (monday) for weeks.
+    """
+    if filters.date and filters.date.start_date and filters.date.end_date:
+        start, end = filters.date.start_date, filters.date.end_date
     else:
-        current_year = datetime.datetime.now().year
-    for i in range(1, 13):
-        date_filter = DateFilter()
-        date_filter.start_date = datetime.datetime(current_year, month=i, day=1)
-        if i == 12:
-            date_filter.end_date = datetime.datetime(current_year + 1, month=1, day=1)
+        if filters.date and filters.date.start_date:
+            current_year = filters.date.start_date.year
         else:
-            date_filter.end_date = datetime.datetime(current_year, month=i + 1, day=1)
-        filters.date = date_filter
-        count = await events_repository.read_with_filters(filters, None, Pagination(page_size=0, page_no=0), count=True)
-        counts[f"{current_year}-{i:02d}"] = count
+            current_year = datetime.datetime.now().year
+        start, end = datetime.datetime(current_year, 1, 1), datetime.datetime(current_year + 1, 1, 1)
 
-    return counts
+    counts = await events_repository.count_by_period(filters, start, end, unit=period)
+    label = "%Y-%m" if period == "month" else "%Y-%m-%d"
+    return {p.strftime(label): count for p, count in counts.items()}
 
 
 class RegionsFilterVariants(BaseModel):
@@ -395,16 +470,12 @@ async def get_all_filters_locations() -> list[LocationsFilterVariants]:
     """
     Get all locations.
     """
-    # From all 'location' fields of events, get unique values
+    # Unique places of events are maintained in a separate collection, sorted by country, region, city
     countries: dict[str, dict[str, RegionsFilterVariants]] = {}
-    unique_locs = set()
-    _ = await events_repository.read_all_locations()
-    for locations in _:
-        for loc in locations:
-            unique_locs.add((loc.get("country"), loc.get("region"), loc.get("city")))
-    unique_locs = sorted(unique_locs, key=lambda x: (x[0], x[1] or "", x[2] or ""))
-
-    for country, region, city in unique_locs:
+    facets = await events_repository.read_location_facets()
+
+    for facet in facets:
+        country, region, city = facet.country, facet.region, facet.city
         if region is None and city in (
             "городской округ",
             "деревня",
@@ -419,7 +490,7 @@ async def get_all_filters_locations() -> list[LocationsFilterVariants]:
             countries[country] = {}
         if region not in countries[country]:
             countries[country][region] = RegionsFilterVariants(region=region, cities=[])
-        if city not in countries[country][region].cities:
+        if city is not None and city not in countries[country][region].cities:
             countries[country][region].cities.append(city)
 
     return [
@@ -485,44 +556,59 @@ async def get_selection(selection_id: PydanticObjectId) -> Selection:
     response_class=Response,
     responses={
         200: {"description": "Get selection in .ics format"},
+        304: {"description": "Calendar is not modified since `If-None-Match` / `If-Modified-Since`"},
         404: {"description": "Selection not found"},
     },
 )
-async def get_selection_ics(selection_id: PydanticObjectId):
+async def get_selection_ics(selection_id: PydanticObjectId, request: Request):
+    """
+    Calendar subscription for the selection with all its events. The rendered feed is cached until events change;
+    polls with `If-None-Match` (or `If-Modified-Since`) get 304 while it is fresh.
+    """
     selection = await events_repository.read_selection(selection_id)
     if selection is None:
         raise HTTPException(status_code=404, detail="Selection not found")
 
-    events = await events_repository.read_with_filters(
-        filters=selection.filters,
-        sort=selection.sort,
-        pagination=Pagination(page_size=1000, page_no=1),
-    )
-    calendar = get_base_calendar()
-    calendar["x-wr-calname"] = "Подборка Спортивных Событий"
+    # Selections are immutable, so the feed changes only with events: the tag follows the persisted collection version
+    collection = await versions_repository.read(Event)
+    modified_at = collection.updated_at if collection else None
+    etag = f'"{selection_id}-{collection.version if collection else 0}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Content-Disposition": 'attachment; filename="schedule.ics"'}
+    if modified_at is not None:
+        headers["Last-Modified"] = http_date(modified_at)
+    if is_not_modified(request, etag, modified_at):
+        return Response(status_code=304, headers=headers)
 
-    for event in events:
-        uid = f"{str(event.id)}@innohassle.ru"
+    cached = events_repository.ics_cache.get(etag)
+    if cached is not None:
+        return Response(content=cached, media_type="text/calendar", headers=headers)
 
-        vevent = icalendar.Event()
-        vevent.add("uid", uid)
+    calendar = get_base_calendar()
+    calendar["x-wr-calname"] = "Подборка Спортивных Событий"
+    # Writes made by this process while rendering drop the feed instead of caching it under the old tag
+    version = events_repository.version
+    events = events_repository.iterate_search(selection.filters, selection.sort, EventIcs)
 
-        vevent.add("summary", f"{event.title}")
-        vevent.add("dtstart", icalendar.vDate(event.start_date))
-        vevent.add("dtend", icalendar.vDate(event.end_date))
-        vevent.add("description", event.description)
-        if event.location:
-            vevent.add("location", "\n".join([str(loc) for loc in event.location]))
-        calendar.add_component(vevent)
+    async def feed():
+        chunks = []
+        async for chunk in render_calendar(calendar, events):
+            chunks.append(chunk)
+            yield chunk
+        if events_repository.version == version:
+            events_repository.ics_cache.set(etag, b"".join(chunks))
 
-    return Response(
-        content=calendar.to_ical(),
-        media_type="text/calendar",
-        headers={"Content-Disposition": 'attachment; filename="schedule.ics"'},
-    )
+    return StreamingResponse(feed(), media_type="text/calendar", headers=headers)
 
 
-@router.get("/{id}", responses={200: {"description": "Info about event"}, 404: {"description": "Event not found"}})
+@router.get(
+    "/{id}",
+    dependencies=[document_etag(Event)],
+    responses={
+        200: {"description": "Info about event"},
+        304: {"description": "Not modified since `If-None-Match`"},
+        404: {"description": "Event not found"},
+    },
+)
 async def get_event(id: PydanticObjectId) -> Event:
     """
     Get info about one event.
@@ -8,6 +8,8 @@ from src.storages.mongo.events import EventStatusEnum, Gender
 
 
 class DateFilter(BaseModel):
+    """Событие проходит хотя бы частично в заданный период"""
+
     start_date: datetime.datetime | None = None
     "Не раньше даты"
     end_date: datetime.datetime | None = None
@@ -34,7 +36,9 @@ class Filters(BaseModel):
     """Список фильтров, которые применяются через И"""
 
     query: str | None = None
-    "Текстовый запрос, чтобы фильтровать по любому полю"
+    "Текстовый запрос по названию, описанию и месту проведения (короткий запрос - по началу названия)"
+    fuzzy: bool = False
+    "Искать `query` нечётко только по названию: с опечатками, е/ё и транслитерацией"
     date: DateFilter | None = None
     "Фильтр по дате"
     discipline: list[str] | None = None
@@ -44,7 +48,7 @@ class Filters(BaseModel):
     gender: Gender | None = None
     "Фильтр по полу участников"
     age: MinMaxFilter | None = None
-    "Фильтр по возрасту участников"
+    "Фильтр по возрасту участников (пересечение с возрастными рамками события, без рамок - подходит)"
     participant_count: MinMaxFilter | None = None
     "Фильтр по количеству участников соревнования"
     by_ids: list[PydanticObjectId] | None = None
@@ -64,6 +68,8 @@ class SortingCriteria(StrEnum):
     "По количеству участников"
     default = "default"
     "По умолчанию (сначала текущие события, потом будущие, потом прошедшие)"
+    relevance = "relevance"
+    "По релевантности текстовому запросу (без запроса - как по умолчанию)"
 
 
 class Sort(BaseModel):
@@ -77,3 +83,5 @@ class Pagination(BaseModel):
     "Количество элементов на странице"
     page_no: int
     "Номер страницы"
+    cursor: str | None = None
+    "Курсор из `next_cursor` предыдущего ответа (если указан, `page_no` не используется)"
@@ -1,10 +1,15 @@
 __all__ = ["federation_repository"]
 
 import datetime
+from collections.abc import Iterable
 
 from beanie import PydanticObjectId
+from beanie.odm.queries.find import FindMany
+from motor.motor_asyncio import AsyncIOMotorCursor
 
+from src.modules.versions.repository import versions_repository
 from src.storages.mongo.federation import Federation, FederationSchema
+from src.storages.mongo.versioning import revised
 
 
 # noinspection PyMethodMayBeStatic
@@ -15,14 +20,55 @@ class FederationRepository:
     async def read_by_region(self, region: str) -> Federation | None:
         return await Federation.find_one(Federation.region == region)
 
+    async def read_ids_by_regions(self, regions: Iterable[str]) -> dict[str, PydanticObjectId]:
+        """
+        Ids of federations by `regions` compared ignoring case and repeated whitespace, one query for all of them.
+        Regions without a federation are missing in the result.
+        """
+
+        def key(region: str) -> str:
+            return " ".join(region.split()).casefold()
+
+        by_key = {}
+        async for doc in Federation.get_motor_collection().find({}, {"region": 1}):
+            by_key[key(doc["region"])] = doc["_id"]
+        return {region: by_key[key(region)] for region in regions if key(region) in by_key}
+
+    async def read_regions(self) -> dict[PydanticObjectId, str]:
+        """
+        Region of each federation by id.
+        """
+        cursor = Federation.get_motor_collection().find({}, {"region": 1})
+        return {doc["_id"]: doc["region"] async for doc in cursor}
+
+    def iterate_raw(self, fields: list[str], batch_size: int = 1000) -> AsyncIOMotorCursor:
+        """
+        Federations as stored with only `fields`, by region (for exports).
+        """
+        return (
+            Federation.get_motor_collection().find({}, dict.fromkeys(fields, 1), batch_size=batch_size).sort("region")
+        )
+
     async def read_all(self) -> list[Federation] | None:
         return await Federation.all().to_list()
 
+    async def read_all_raw(self) -> list[dict]:
+        """
+        All documents as stored, without validation (for `raw_json_response`).
+        """
+        return await Federation.get_motor_collection().find().to_list(length=None)
+
+    def iterate_all(self, batch_size: int = 500) -> FindMany[Federation]:
+        return Federation.all(batch_size=batch_size)
+
     async def create(self, federation: FederationSchema) -> Federation:
-        return await Federation.model_validate(federation, from_attributes=True).insert()
+        created = await Federation.model_validate(federation, from_attributes=True).revise().insert()
+        await versions_repository.bump(Federation)
+        return created
 
     async def update(self, id: PydanticObjectId, data: FederationSchema) -> Federation | None:
-        await Federation.find_one(Federation.id == id).update({"$set": data.model_dump()})
+        await Federation.find_one(Federation.id == id).update(revised({"$set": data.model_dump()}))
+        await versions_repository.bump(Federation)
         return await Federation.get(id)
 
     async def accredite(self, id: PydanticObjectId, status: str, status_comment: str | None) -> Federation | None:
@@ -31,13 +77,22 @@ class FederationRepository:
             return None
         f.status = status
         f.status_comment = status_comment
-        await f.save()
+        await f.revise().save()
+        await versions_repository.bump(Federation)
         return f
 
     async def touch(self, id: PydanticObjectId) -> None:
         await Federation.find_one(Federation.id == id).update(
-            {"$set": {"last_interaction_at": datetime.datetime.now(datetime.UTC), "notified_about_interaction": False}}
+            revised(
+                {
+                    "$set": {
+                        "last_interaction_at": datetime.datetime.now(datetime.UTC),
+                        "notified_about_interaction": False,
+                    }
+                }
+            )
         )
+        await versions_repository.bump(Federation)
 
     async def read_last_interacted_at(self, older_than: datetime.datetime) -> list[Federation]:
         return await Federation.find(
@@ -45,7 +100,8 @@ class FederationRepository:
         ).to_list()
 
     async def set_notified_about_interaction(self, id: PydanticObjectId) -> None:
-        await Federation.find_one({"_id": id}).update({"$set": {"notified_about_interaction": True}})
+        await Federation.find_one({"_id": id}).update(revised({"$set": {"notified_about_interaction": True}}))
+        await versions_repository.bump(Federation)
 
 
 federation_repository: FederationRepository = FederationRepository()
@@ -1,10 +1,14 @@
 import datetime
-from io import StringIO
+from collections.abc import AsyncIterator
 
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Request, Response
 
+from src.api.conditional import collection_etag, document_etag
 from src.api.dependencies import USER_AUTH
+from src.api.exports import csv_response, export_fields, xlsx_response
+from src.api.raw_json import raw_encoder, raw_json_response
+from src.api.streaming import NDJSON_RESPONSE, ndjson_response, wants_ndjson
 from src.logging_ import logger
 from src.modules.events.repository import events_repository
 from src.modules.federation.repository import federation_repository
@@ -21,42 +25,51 @@ from src.storages.mongo.users import UserRole
 router = APIRouter(prefix="/federations", tags=["Federations"])
 
 
-@router.get("/", responses={200: {"description": "Info about all federations"}})
-async def get_all_federations() -> list[Federation]:
+@router.get(
+    "/",
+    dependencies=[collection_etag(Federation)],
+    responses={
+        200: {"description": "Info about all federations", **NDJSON_RESPONSE},
+        304: {"description": "Not modified since `If-None-Match`"},
+    },
+)
+async def get_all_federations(request: Request, response: Response, stream: bool = False) -> list[Federation]:
     """
-    Get info about all events.
+    Get info about all federations.
+
+    With `Accept: application/x-ndjson` or `?stream=1` federations are streamed one per line as they are read.
     """
-    return await federation_repository.read_all()
+    if wants_ndjson(request, stream):
+        return ndjson_response(federation_repository.iterate_all(), headers=response.headers)
+    return raw_json_response(Federation, await federation_repository.read_all_raw(), headers=response.headers)
+
+
+FEDERATION_EXPORT_FIELDS = export_fields(
+    FederationSchema,
+    exclude=["last_interaction_at", "notified_about_interaction", "status", "status_comment"],
+)
+
+
+async def federation_export_rows() -> AsyncIterator[dict]:
+    encoder = raw_encoder(FederationSchema)
+    async for doc in federation_repository.iterate_raw(FEDERATION_EXPORT_FIELDS):
+        yield encoder.prepare(doc)
 
 
 @router.get("/.csv", responses={200: {"description": "Info about all federations"}})
 async def get_all_federations_as_csv() -> Response:
     """
-    Get info about all events.
+    Get info about all federations as CSV, streamed as they are read.
     """
-    import csv
-
-    federations = await federation_repository.read_all()
-
-    with StringIO() as f:
-        fieldnames = list(FederationSchema.__pydantic_fields__.keys())
-        for exclude in ["id", "last_interaction_at", "notified_about_interaction", "status", "status_comment"]:
-            try:
-                fieldnames.remove(exclude)
-            except ValueError:
-                pass
-        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-        writer.writeheader()
-        for federation in federations:
-            writer.writerow(federation.model_dump())
-        f.seek(0)
-        resp = f.getvalue()
-
-    return Response(
-        content=resp,
-        media_type="application/csv",
-        headers={"Content-Disposition": "attachment; filename=federations.csv"},
-    )
+    return csv_response(federation_export_rows(), FEDERATION_EXPORT_FIELDS, "federations.csv")
+
+
+@router.get("/.xlsx", responses={200: {"description": "Info about all federations"}})
+async def get_all_federations_as_xlsx() -> Response:
+    """
+    Get info about all federations as XLSX.
+    """
+    return xlsx_response(federation_export_rows(), FEDERATION_EXPORT_FIELDS, "federations.xlsx")
 
 
 class FederationStats(BaseSchema):
@@ -155,7 +168,13 @@ async def stats_federation(id: PydanticObjectId) -> FederationStats:
 
 
 @router.get(
-    "/{id}", responses={200: {"description": "Info about federation"}, 404: {"description": "Federation not found"}}
+    "/{id}",
+    dependencies=[document_etag(Federation)],
+    responses={
+        200: {"description": "Info about federation"},
+        304: {"description": "Not modified since `If-None-Match`"},
+        404: {"description": "Federation not found"},
+    },
 )
 async def get_federation(id: PydanticObjectId) -> Federation:
     """
@@ -0,0 +1,56 @@
+__all__ = ["NamePrefixIndex"]
+
+from bisect import bisect_left, insort
+
+from beanie import PydanticObjectId
+
+from src.storages.mongo import Participant
+
+
+class NamePrefixIndex:
+    """
+    In-process prefix index of participants' `name_keys`: a sorted array of `(key, id)` pairs, where all keys
+    starting with a prefix form one contiguous run found by binary search (the flattened form of a trie).
+    Each worker keeps its own copy, so it is only consistent when all writes go through this process.
+    """
+
+    def __init__(self):
+        self._entries: list[tuple[str, PydanticObjectId]] = []
+        self._keys: dict[PydanticObjectId, list[str]] = {}
+        self.ready = False
+
+    async def warm(self) -> int:
+        """
+        Load keys of all participants, returns the number of participants.
+        """
+        keys: dict[PydanticObjectId, list[str]] = {}
+        async for doc in Participant.get_motor_collection().find({}, {"name_keys": 1}):
+            keys[doc["_id"]] = doc.get("name_keys") or []
+        self._keys = keys
+        self._entries = sorted((key, id_) for id_, id_keys in keys.items() for key in id_keys)
+        self.ready = True
+        return len(keys)
+
+    def set(self, id_: PydanticObjectId, keys: list[str]) -> None:
+        self.remove(id_)
+        self._keys[id_] = keys
+        for key in keys:
+            insort(self._entries, (key, id_))
+
+    def remove(self, id_: PydanticObjectId) -> None:
+        for key in self._keys.pop(id_, []):
+            i = bisect_left(self._entries, (key, id_))
+            if i < len(self._entries) and self._entries[i] == (key, id_):
+                del self._entries[i]
+
+    def lookup(self, prefix: str, limit: int) -> list[PydanticObjectId]:
+        """
+        Ids of participants having a key starting with `prefix` (normalized), in order of keys.
+        """
+        found: dict[PydanticObjectId, None] = {}
+        for i in range(bisect_left(self._entries, (prefix,)), len(self._entries)):
+            key, id_ = self._entries[i]
+            if not key.startswith(prefix) or len(found) >= limit:
+                break
+            found[id_] = None
+        return list(found)
@@ -1,19 +1,64 @@
-from beanie import PydanticObjectId
+import re
+from collections.abc import Iterable
 
+from beanie import PydanticObjectId, SortDirection
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+from src.cache import TTLCache
+from src.config import settings
+from src.modules.participants.prefix_index import NamePrefixIndex
 from src.modules.results.repository import result_repository
+from src.modules.standings.repository import standings_repository
+from src.modules.versions.repository import versions_repository
 from src.storages.mongo import Participant
+from src.storages.mongo.keyset import decode_cursor, encode_cursor, keyset_match
 from src.storages.mongo.participant import ParticipantSchema
+from src.storages.mongo.projection import ProjectionSchema
+from src.storages.mongo.trigrams import (
+    fuzzy_pipeline,
+    name_keys,
+    normalize_text,
+    rebuild_derived,
+    rebuild_trigrams,
+    trigrams,
+)
+from src.storages.mongo.versioning import revised
 
 
 class ParticipantRepository:
-    async def read_all(self, skip: int | None = None, limit: int | None = None) -> list[Participant]:
-        q = Participant.all().sort("name")
+    NAME_ORDER = [("name", SortDirection.ASCENDING), ("_id", SortDirection.ASCENDING)]
+
+    def __init__(self, prefix_index: bool = False, name_cache_size: int = 4096, name_cache_ttl: float = 60):
+        self.prefix_index: NamePrefixIndex | None = NamePrefixIndex() if prefix_index else None
+        # Normalized name -> ids of participants with it, for resolving names from uploaded protocols
+        self._name_cache: TTLCache[str, list[PydanticObjectId]] = TTLCache(name_cache_size, name_cache_ttl)
+
+    async def read_all(
+        self, skip: int | None = None, limit: int | None = None, cursor: str | None = None
+    ) -> list[Participant]:
+        """
+        :raises ValueError: if cursor is malformed
+        """
+        q = Participant.all()
+        if cursor is not None:
+            q = q.find(keyset_match(self.NAME_ORDER, decode_cursor(cursor)["key"]))
+        q = q.sort(*self.NAME_ORDER)
         if skip is not None:
             q = q.skip(skip)
         if limit is not None:
             q = q.limit(limit)
         return await q.to_list()
 
+    def iterate_raw(self, fields: list[str], batch_size: int = 1000) -> AsyncIOMotorCursor:
+        """
+        Participants as stored with only `fields`, by name (for exports).
+        """
+        cursor = Participant.get_motor_collection().find({}, dict.fromkeys(fields, 1), batch_size=batch_size)
+        return cursor.sort(self.NAME_ORDER)
+
+    def cursor_after(self, participant: Participant) -> str:
+        return encode_cursor({"key": [participant.name, participant.id]})
+
     async def read_for_federation(
         self, federation_id: PydanticObjectId, skip: int | None = None, limit: int | None = None
     ) -> list[Participant]:
@@ -24,6 +69,13 @@ class ParticipantRepository:
             q = q.limit(limit)
         return await q.to_list()
 
+    async def read_for_federation_raw(self, federation_id: PydanticObjectId) -> list[dict]:
+        """
+        Participants of the federation as stored, without validation (for `raw_json_response`).
+        """
+        cursor = Participant.get_motor_collection().find({"related_federation": federation_id}).sort("name")
+        return await cursor.to_list(length=None)
+
     async def stats_for_federation(self, federation_id: PydanticObjectId) -> dict[str, int]:
         q = Participant.find({"related_federation": federation_id}).aggregate(
             [{"$group": {"_id": "$rank", "count": {"$sum": 1}}}]
@@ -39,30 +91,122 @@ class ParticipantRepository:
             q = q.find({"gender": gender})
         return await q.count()
 
-    async def read_many(self, ids: list[PydanticObjectId]) -> list[Participant]:
-        return await Participant.find({"_id": {"$in": ids}}).to_list()
+    async def read_many(
+        self, ids: list[PydanticObjectId], projection: type[ProjectionSchema] | None = None
+    ) -> list[Participant] | list[ProjectionSchema]:
+        return await Participant.find({"_id": {"$in": ids}}, projection_model=projection).to_list()
 
     async def exists_by_name(self, names: list[str]) -> list[Participant]:
         return await Participant.find({"name": {"$in": names}}).to_list()
 
+    def _to_document(self, data: ParticipantSchema) -> Participant:
+        document = Participant.model_validate(data, from_attributes=True)
+        document.trigrams = trigrams(data.name)
+        document.name_keys = name_keys(data.name)
+        return document.revise()
+
+    async def hint(self, name: str, limit: int = 10) -> list[Participant]:
+        """
+        Participants whose name (from any word) starts with `name`; if there are not enough of them, similar names
+        (typos, е/ё, transliteration) are added, the most similar first.
+        """
+        prefix = normalize_text(name)
+        if not prefix:
+            return []
+        if self.prefix_index is not None and self.prefix_index.ready:
+            ids = self.prefix_index.lookup(prefix, limit)
+            by_id = {p.id: p for p in await Participant.find({"_id": {"$in": ids}}).to_list()}
+            found = [by_id[id_] for id_ in ids if id_ in by_id]
+        else:
+            # Anchored case-sensitive regex is an index range scan on `name_keys`
+            found = await Participant.find({"name_keys": {"$regex": f"^{re.escape(prefix)}"}}).to_list(limit)
+        if len(found) < limit:
+            pipeline = fuzzy_pipeline("trigrams", name, limit + len(found))
+            similar = await Participant.aggregate(pipeline, projection_model=Participant).to_list()
+            ids = {p.id for p in found}
+            found.extend([p for p in similar if p.id not in ids][: limit - len(found)])
+        return found
+
+    async def rebuild_trigrams(self) -> None:
+        """
+        Recalculate `trigrams` of all participants (backfill).
+        """
+        await rebuild_trigrams(Participant, "name")
+
+    async def rebuild_name_keys(self) -> None:
+        """
+        Recalculate `name_keys` of all participants (backfill).
+        """
+        await rebuild_derived(Participant, "name", "name_keys", name_keys)
+        self._name_cache.clear()
+        if self.prefix_index is not None:
+            await self.prefix_index.warm()
+
     async def create(self, data: ParticipantSchema) -> Participant:
-        return await Participant.model_validate(data, from_attributes=True).insert()
+        created = await self._to_document(data).insert()
+        await versions_repository.bump(Participant)
+        self._name_cache.clear()
+        if self.prefix_index is not None:
+            self.prefix_index.set(created.id, created.name_keys)
+        return created
 
     async def delete(self, id: PydanticObjectId):
         await Participant.find_one({"_id": id}).delete()
+        await versions_repository.bump(Participant)
+        self._name_cache.clear()
+        if self.prefix_index is not None:
+            self.prefix_index.remove(id)
         await result_repository.replace_id_with_none(id)
+        await standings_repository.refresh_participants([id])
 
     async def update(self, id: PydanticObjectId, data: ParticipantSchema) -> Participant | None:
-        await Participant.find_one({"_id": id}).update({"$set": data.model_dump()})
+        await Participant.find_one({"_id": id}).update(
+            revised({"$set": {**data.model_dump(), "trigrams": trigrams(data.name), "name_keys": name_keys(data.name)}})
+        )
+        await versions_repository.bump(Participant)
+        self._name_cache.clear()
+        if self.prefix_index is not None:
+            self.prefix_index.set(id, name_keys(data.name))
+        await standings_repository.rename_participant(id, data.name)
         return await Participant.get(id)
 
-    async def create_many(self, data: list[ParticipantSchema]) -> None:
-        await Participant.insert_many([Participant.model_validate(p, from_attributes=True) for p in data])
+    async def create_many(self, data: list[ParticipantSchema], batch: int = 1000) -> None:
+        """
+        Insert participants with unordered batched `insert_many`.
+        """
+        if not data:
+            return
+        for start in range(0, len(data), batch):
+            documents = [self._to_document(p) for p in data[start : start + batch]]
+            inserted = await Participant.insert_many(documents, ordered=False)
+            if self.prefix_index is not None:
+                for id_, document in zip(inserted.inserted_ids, documents, strict=True):
+                    self.prefix_index.set(id_, document.name_keys)
+        await versions_repository.bump(Participant)
+        self._name_cache.clear()
 
-    async def name_x_id(self) -> dict[str, PydanticObjectId]:
-        q = Participant.find().aggregate([{"$project": {"name": 1, "_id": 1}}])
-        r = await q.to_list()
-        return {p["name"]: p["_id"] for p in r}
+    async def resolve_names(self, names: Iterable[str]) -> dict[str, list[PydanticObjectId]]:
+        """
+        Ids of participants for each of `names`, matched by normalized name in any word order: one indexed query
+        for all names missing in the cache. Several ids mean the name is ambiguous, none - the name is unknown.
+        """
+        keys = {name: normalize_text(name) for name in names}
+        resolved: dict[str, list[PydanticObjectId]] = {}
+        for key in set(keys.values()):
+            ids = self._name_cache.get(key)
+            if ids is not None:
+                resolved[key] = ids
+        missing = {key for key in keys.values() if key not in resolved}
+        if missing:
+            found: dict[str, list[PydanticObjectId]] = {key: [] for key in missing}
+            cursor = Participant.get_motor_collection().find({"name_keys": {"$in": list(missing)}}, {"name_keys": 1})
+            async for doc in cursor:
+                for key in missing.intersection(doc.get("name_keys", [])):
+                    found[key].append(doc["_id"])
+            for key, ids in found.items():
+                self._name_cache.set(key, ids)
+            resolved.update(found)
+        return {name: resolved[key] for name, key in keys.items()}
 
 
-participant_repository: ParticipantRepository = ParticipantRepository()
+participant_repository: ParticipantRepository = ParticipantRepository(prefix_index=settings.participant_name_index)
@@ -1,30 +1,55 @@
-from collections import Counter, defaultdict
-from io import StringIO
+import datetime
+from collections.abc import AsyncIterator
+from typing import Annotated
 
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import ValidationError
 
+from src.api.conditional import document_etag
 from src.api.dependencies import USER_AUTH
+from src.api.exports import csv_response, export_fields, xlsx_response
+from src.api.projection import FIELDS_RESPONSE, projected_response
+from src.api.raw_json import raw_encoder, raw_json_response
 from src.logging_ import logger
+from src.modules.events.repository import events_repository
+from src.modules.events.schemas import DateFilter, Filters
 from src.modules.federation.repository import federation_repository
 from src.modules.participants.repository import participant_repository
 from src.modules.results.repository import result_repository
+from src.modules.results.schemas import EventParticipation
+from src.modules.standings.repository import standings_repository
 from src.modules.users.repository import user_repository
 from src.pydantic_base import BaseSchema
 from src.storages.mongo import Participant
-from src.storages.mongo.participant import ParticipantSchema
-from src.storages.mongo.results import SoloPlace, TeamPlace
+from src.storages.mongo.participant import PARTICIPANT_PROJECTIONS, ParticipantSchema
+from src.storages.mongo.projection import resolve_projection
+from src.storages.mongo.standings import Participation
 from src.storages.mongo.users import UserRole
 
 router = APIRouter(prefix="/participants", tags=["Participants"])
 
 
-class Participation(BaseSchema):
-    result_id: PydanticObjectId
-    event_id: PydanticObjectId
-    event_title: str
-    solo_place: SoloPlace | None = None
-    team_place: TeamPlace | None = None
+def leaderboard_scope(
+    federation: PydanticObjectId | None = None,
+    discipline: str | None = None,
+    start_date: datetime.datetime | None = None,
+    end_date: datetime.datetime | None = None,
+) -> Filters | None:
+    """
+    Events whose results count in a leaderboard: hosted by `federation`, of `discipline`, held at least partially
+    between `start_date` and `end_date`. None - all events.
+    """
+    if federation is None and discipline is None and start_date is None and end_date is None:
+        return None
+    return Filters(
+        host_federation=federation,
+        discipline=[discipline] if discipline else None,
+        date=DateFilter(start_date=start_date, end_date=end_date) if start_date or end_date else None,
+    )
+
+
+LEADERBOARD_SCOPE = Annotated[Filters | None, Depends(leaderboard_scope)]
 
 
 class ParticipantStats(BaseSchema):
@@ -53,82 +78,152 @@ async def create_participant(data: ParticipantSchema, auth: USER_AUTH) -> Partic
         raise HTTPException(status_code=403, detail="Only admin or related federation can create participant")
 
 
+IMPORT_CHUNK_SIZE = 1000
+
+
+class ImportRowError(BaseSchema):
+    row: int
+    "Номер строки (с 0)"
+    error: str
+    "Почему строка не импортирована"
+
+
+class ImportReport(BaseSchema):
+    created: int = 0
+    "Количество созданных участников"
+    errors: list[ImportRowError] = []
+    "Строки, которые не импортированы"
+
+
+def describe_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors(include_url=False))
+
+
 @router.post("/person/create-many")
-async def create_many_participant(data: list[dict], auth: USER_AUTH) -> None:
+async def create_many_participant(data: list[dict], auth: USER_AUTH) -> ImportReport:
+    """
+    Import participants, `related_federation` is a region of the federation. Rows with unknown regions
+    or invalid data are skipped and reported, the others are created.
+    """
     user = await user_repository.read(auth.user_id)
     if user.role == UserRole.ADMIN:
-        for p in data:
-            if "related_federation" in p:
-                federation = await federation_repository.read_by_region(p["related_federation"])
-                if federation is None:
-                    logger.error(f"Federation with region {p['related_federation']} not found")
-                p["related_federation"] = (await federation_repository.read_by_region(p["related_federation"])).id
-        await participant_repository.create_many([ParticipantSchema.model_validate(p) for p in data])
+        regions = {p["related_federation"] for p in data if isinstance(p.get("related_federation"), str)}
+        region_x_id = await federation_repository.read_ids_by_regions(regions)
+        report = ImportReport()
+        for start in range(0, len(data), IMPORT_CHUNK_SIZE):
+            valid = []
+            for i, p in enumerate(data[start : start + IMPORT_CHUNK_SIZE], start):
+                region = p.get("related_federation")
+                if region is not None and not isinstance(region, str):
+                    report.errors.append(ImportRowError(row=i, error="related_federation: region must be a string"))
+                    continue
+                if region is not None and region not in region_x_id:
+                    report.errors.append(ImportRowError(row=i, error=f"Federation with region {region} not found"))
+                    continue
+                try:
+                    valid.append(ParticipantSchema.model_validate({**p, "related_federation": region_x_id.get(region)}))
+                except ValidationError as e:
+                    report.errors.append(ImportRowError(row=i, error=describe_validation_error(e)))
+            await participant_repository.create_many(valid)
+            report.created += len(valid)
+        if report.errors:
+            logger.warning(f"Participants import: {len(report.errors)} rows skipped")
+        return report
     else:
         raise HTTPException(status_code=403, detail="Only admin or related federation can create participant")
 
 
-@router.get("/person/")
-async def get_particapnts(auth: USER_AUTH, skip: int = 0, limit: int = 100) -> list[Participant]:
+@router.get("/person/", responses={400: {"description": "Invalid cursor"}})
+async def get_particapnts(
+    auth: USER_AUTH, response: Response, skip: int = 0, limit: int = 100, cursor: str | None = None
+) -> list[Participant]:
+    """
+    Список участников по ФИО. Курсор следующей страницы возвращается в заголовке `X-Next-Cursor`,
+    его можно передать в `cursor` вместо `skip`.
+    """
     user = await user_repository.read(auth.user_id)
     if user.role == UserRole.ADMIN:
-        return await participant_repository.read_all(skip=skip, limit=limit)
+        try:
+            participants = await participant_repository.read_all(
+                skip=None if cursor else skip, limit=limit, cursor=cursor
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if participants and len(participants) == limit:
+            response.headers["X-Next-Cursor"] = participant_repository.cursor_after(participants[-1])
+        return participants
     else:
         raise HTTPException(status_code=403, detail="Only admin can get all participants")
 
 
+PARTICIPANT_EXPORT_FIELDS = export_fields(ParticipantSchema)
+
+
+async def participant_export_rows(id_x_region: dict[PydanticObjectId, str]) -> AsyncIterator[dict]:
+    encoder = raw_encoder(ParticipantSchema)
+    async for doc in participant_repository.iterate_raw(PARTICIPANT_EXPORT_FIELDS):
+        row = encoder.prepare(doc)
+        row["related_federation"] = id_x_region.get(row["related_federation"], "")
+        yield row
+
+
 @router.get("/person/.csv")
 async def get_participants_csv(auth: USER_AUTH) -> Response:
-    import csv
-
+    """
+    All participants as CSV, streamed as they are read.
+    """
     user = await user_repository.read(auth.user_id)
     if user.role == UserRole.ADMIN:
-        participants = await participant_repository.read_all()
-        federations = await federation_repository.read_all()
-        id_x_federation = {f.id: f.region for f in federations}
+        rows = participant_export_rows(await federation_repository.read_regions())
+        return csv_response(rows, PARTICIPANT_EXPORT_FIELDS, "participants.csv")
+    else:
+        raise HTTPException(status_code=403, detail="Only admin can get all participants")
 
-        with StringIO() as f:
-            fieldnames = list(ParticipantSchema.__pydantic_fields__.keys())
-            for exclude in ["id"]:
-                try:
-                    fieldnames.remove(exclude)
-                except ValueError:
-                    pass
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-            writer.writeheader()
-            for p in participants:
-                as_dict = p.model_dump()
-                as_dict["related_federation"] = id_x_federation.get(as_dict["related_federation"], "")
-                writer.writerow(as_dict)
-            f.seek(0)
-            resp = f.getvalue()
-
-        return Response(
-            content=resp,
-            media_type="application/csv",
-            headers={"Content-Disposition": "attachment; filename=participants.csv"},
-        )
+
+@router.get("/person/.xlsx")
+async def get_participants_xlsx(auth: USER_AUTH) -> Response:
+    """
+    All participants as XLSX.
+    """
+    user = await user_repository.read(auth.user_id)
+    if user.role == UserRole.ADMIN:
+        rows = participant_export_rows(await federation_repository.read_regions())
+        return xlsx_response(rows, PARTICIPANT_EXPORT_FIELDS, "participants.xlsx")
     else:
         raise HTTPException(status_code=403, detail="Only admin can get all participants")
 
 
 @router.get("/person/count")
-async def get_participant_count() -> int:
-    return await result_repository.get_participant_count()
+async def get_participant_count(scope: LEADERBOARD_SCOPE) -> int:
+    """
+    Number of unique participants in results: registered participants are counted by id, the others by name.
+    With a scope (as for leaderboards) only results of matching events are counted.
+    """
+    if scope is None:
+        return await result_repository.get_participant_count()
+    event_ids = await events_repository.read_ids_with_filters(scope)
+    return await result_repository.count_participants(event_ids)
 
 
 @router.get("/person/hint")
 async def get_participant_hint(name: str) -> list[Participant]:
+    """
+    Participants for autocomplete: names containing `name`, then similar ones (typos, е/ё, transliteration).
+    """
     if not name:
         return []
 
-    participants_in_registry = await Participant.find({"name": {"$regex": name, "$options": "i"}}).to_list(10)
-    return participants_in_registry
+    return await participant_repository.hint(name)
 
 
 @router.get(
     "/person/get/{id}",
-    responses={200: {"description": "Info about participant"}, 404: {"description": "Participant not found"}},
+    dependencies=[document_etag(Participant)],
+    responses={
+        200: {"description": "Info about participant"},
+        304: {"description": "Not modified since `If-None-Match`"},
+        404: {"description": "Participant not found"},
+    },
 )
 async def get_participant(id: PydanticObjectId) -> Participant:
     participant = await Participant.get(id)
@@ -183,10 +278,20 @@ async def delete_participant(id: PydanticObjectId, auth: USER_AUTH) -> Participa
 
 @router.get(
     "/person/many/",
-    responses={200: {"description": "Info about participants"}},
+    responses={200: {"description": "Info about participants"}, **FIELDS_RESPONSE},
 )
-async def get_participants(ids: list[PydanticObjectId]) -> list[Participant]:
-    return await participant_repository.read_many(ids)
+async def get_participants(ids: list[PydanticObjectId], fields: str | None = None) -> list[Participant]:
+    """
+    Info about participants. `fields` limits fields of participants: a preset (`card`) or comma-separated field names.
+    """
+    try:
+        projection = resolve_projection(Participant, PARTICIPANT_PROJECTIONS, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    participants = await participant_repository.read_many(ids, projection)
+    if projection:
+        return projected_response(participants)
+    return participants
 
 
 @router.get(
@@ -194,143 +299,52 @@ async def get_participants(ids: list[PydanticObjectId]) -> list[Participant]:
     responses={200: {"description": "Info about participants"}},
 )
 async def federation_participants(federation_id: PydanticObjectId) -> list[Participant]:
-    participants = await participant_repository.read_for_federation(federation_id)
-    return participants
+    return raw_json_response(Participant, await participant_repository.read_for_federation_raw(federation_id))
+
+
+TOTAL_COUNT_RESPONSE = {"headers": {"X-Total-Count": {"description": "Number of items matching the query"}}}
 
 
-@router.get("/person/stats/all")
+@router.get("/person/stats/all", responses={200: TOTAL_COUNT_RESPONSE})
 async def get_all_participants_stats(
-    limit: int = 100, skip: int = 0, query: str | None = None
+    response: Response, scope: LEADERBOARD_SCOPE, limit: int = 100, skip: int = 0, query: str | None = None
 ) -> list[tuple[int, ParticipantStats]]:
     """
-    Список статистик участников: список кортежей (место в рейтинге, ParticipantStats)
+    Список статистик участников: список кортежей (место в рейтинге, ParticipantStats).
+    Рейтинг можно ограничить мероприятиями федерации, дисциплины или периода.
     """
+    standings, total = await standings_repository.read_participants(skip, limit, query, scope)
+    response.headers["X-Total-Count"] = str(total)
+    return [(s.rank, ParticipantStats.model_validate(s, from_attributes=True)) for s in standings]
 
-    results = await result_repository.read_all()
-    total = Counter()
-    golds = Counter()
-    silvers = Counter()
-    bronzes = Counter()
-    participations = defaultdict(list)
-
-    for result in results:
-        for solo in result.solo_places or []:
-            if not solo.participant.id:
-                continue
-            key_ = solo.participant.id
-            total[key_] += 1
-            if solo.place == 1:
-                golds[key_] += 1
-            elif solo.place == 2:
-                silvers[key_] += 1
-            elif solo.place == 3:
-                bronzes[key_] += 1
-            participations[key_].append(
-                Participation(
-                    result_id=result.id,
-                    event_id=result.event_id,
-                    event_title=result.event_title,
-                    solo_place=solo,
-                )
-            )
 
-        for team in result.team_places or []:
-            for member in team.members:
-                if not member.id:
-                    continue
-                key_ = member.id
-                total[key_] += 1
-                if team.place == 1:
-                    golds[key_] += 1
-                elif team.place == 2:
-                    silvers[key_] += 1
-                elif team.place == 3:
-                    bronzes[key_] += 1
-                participations[key_].append(
-                    Participation(
-                        result_id=result.id,
-                        event_id=result.event_id,
-                        event_title=result.event_title,
-                        team_place=team,
-                    )
-                )
-    participant_in_registry = await participant_repository.read_all()
-    id_to_name = {p.id: p.name for p in participant_in_registry}
-
-    participants = [
-        ParticipantStats(
-            id=id,
-            name=id_to_name.get(id, ""),
-            participations=participations[id],
-            total=total[id],
-            golds=golds[id],
-            silvers=silvers[id],
-            bronzes=bronzes[id],
-        )
-        for id in total
-    ]
-
-    def score(p: ParticipantStats):
-        return p.golds, p.silvers, p.bronzes, p.total
-
-    participants.sort(key=lambda p: (*score(p), p.name), reverse=True)
-
-    # same score should have the same place
-    place = 1
-    places = []
-    for i in range(len(participants)):
-        if i > 0 and score(participants[i]) != score(participants[i - 1]):
-            place = i + 1
-        places.append(place)
-
-    result = list(zip(places, participants[skip : skip + limit]))
-
-    if query:
-        result = [(place, p) for (place, p) in result if query.lower() in p.name.lower()]
-
-    return result[skip : skip + limit]
+class ParticipantProfile(ParticipantStats):
+    participations: list[EventParticipation]
+    "Участия с датами и дисциплинами мероприятий"
 
 
 @router.get(
     "/person/stats/{id}",
     responses={200: {"description": "Stats about participant"}, 404: {"description": "Participant not found"}},
 )
-async def get_participant_stats(id: PydanticObjectId) -> ParticipantStats:
+async def get_participant_stats(id: PydanticObjectId) -> ParticipantProfile:
     participant = await Participant.get(id)
 
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
 
-    results = await result_repository.read_for_participant(participant_id=id)
-
-    participations = []
-    for result in results:
-        participations.append(
-            Participation(
-                result_id=result.id,
-                event_id=result.event_id,
-                event_title=result.event_title,
-                solo_place=next((p for p in result.solo_places or [] if p.participant.id == id), None),
-                team_place=next((p for p in result.team_places or [] if p.participant.id == id), None),
-            )
-        )
-
-    total = len(participations)
-    golds = sum(1 for p in participations if p.solo_place and p.solo_place.place == 1)
-    silvers = sum(1 for p in participations if p.solo_place and p.solo_place.place == 2)
-    bronzes = sum(1 for p in participations if p.solo_place and p.solo_place.place == 3)
-    golds += sum(1 for p in participations if p.team_place and p.team_place.place == 1)
-    silvers += sum(1 for p in participations if p.team_place and p.team_place.place == 2)
-    bronzes += sum(1 for p in participations if p.team_place and p.team_place.place == 3)
+    participations = await result_repository.read_participations(participant_id=id)
+    places = [p.solo_place.place for p in participations if p.solo_place]
+    places += [p.team_place.place for p in participations if p.team_place]
 
-    return ParticipantStats(
+    return ParticipantProfile(
         id=id,
         name=participant.name,
         participations=participations,
-        total=total,
-        golds=golds,
-        silvers=silvers,
-        bronzes=bronzes,
+        total=len(participations),
+        golds=places.count(1),
+        silvers=places.count(2),
+        bronzes=places.count(3),
     )
 
 
@@ -351,95 +365,20 @@ class TeamStats(BaseSchema):
 
 @router.get("/team/")
 async def get_team(name: str) -> TeamStats:
-    if not name:
+    standing = await standings_repository.read_team(name) if name else None
+    if standing is None:
         return TeamStats(name=name, participations=[])
-    results = await result_repository.read_for_team(name)
-
-    participations = []
-    for result in results:
-        participations.append(
-            Participation(
-                result_id=result.id,
-                event_id=result.event_id,
-                event_title=result.event_title,
-                team_place=next((p for p in result.team_places or [] if p.team == name), None),
-            )
-        )
-
-    total = len(participations)
-    golds = sum(1 for p in participations if p.team_place and p.team_place.team == name and p.team_place.place == 1)
-    silvers = sum(1 for p in participations if p.team_place and p.team_place.team == name and p.team_place.place == 2)
-    bronzes = sum(1 for p in participations if p.team_place and p.team_place.team == name and p.team_place.place == 3)
-
-    return TeamStats(
-        name=name,
-        participations=participations,
-        total=total,
-        golds=golds,
-        silvers=silvers,
-        bronzes=bronzes,
-    )
+    return TeamStats.model_validate(standing, from_attributes=True)
 
 
-@router.get("/team/all")
-async def get_all_teams(limit: int = 100, skip: int = 0, query: str | None = None) -> list[tuple[int, TeamStats]]:
+@router.get("/team/all", responses={200: TOTAL_COUNT_RESPONSE})
+async def get_all_teams(
+    response: Response, scope: LEADERBOARD_SCOPE, limit: int = 100, skip: int = 0, query: str | None = None
+) -> list[tuple[int, TeamStats]]:
     """
-    Список статистик команд: список кортежей (место в рейтинге, ParticipantStats)
+    Список статистик команд: список кортежей (место в рейтинге, ParticipantStats).
+    Рейтинг можно ограничить мероприятиями федерации, дисциплины или периода.
     """
-    results = await result_repository.read_all()
-    total = Counter()
-    golds = Counter()
-    silvers = Counter()
-    bronzes = Counter()
-    participations = defaultdict(list)
-
-    for result in results:
-        for team in result.team_places or []:
-            total[team.team] += 1
-            if team.place == 1:
-                golds[team.team] += 1
-            elif team.place == 2:
-                silvers[team.team] += 1
-            elif team.place == 3:
-                bronzes[team.team] += 1
-            participations[team.team].append(
-                Participation(
-                    result_id=result.id,
-                    event_id=result.event_id,
-                    event_title=result.event_title,
-                    team_place=team,
-                )
-            )
-
-    teams = [
-        TeamStats(
-            name=team,
-            participations=participations[team],
-            total=total[team],
-            golds=golds[team],
-            silvers=silvers[team],
-            bronzes=bronzes[team],
-        )
-        for team in total
-        if team
-    ]
-
-    def score(t: TeamStats):
-        return t.golds, t.silvers, t.bronzes, t.total
-
-    teams.sort(key=lambda t: (*score(t), t.name), reverse=True)
-
-    # same score should have the same place
-    place = 1
-    places = []
-    for i in range(len(teams)):
-        if i > 0 and score(teams[i]) != score(teams[i - 1]):
-            place = i + 1
-        places.append(place)
-
-    result = list(zip(places, teams))[skip : skip + limit]
-
-    if query:
-        result = [(place, t) for (place, t) in result if query.lower() in t.name.lower()]
-
-    return result[skip : skip + limit]
+    standings, total = await standings_repository.read_teams(skip, limit, query, scope)
+    response.headers["X-Total-Count"] = str(total)
+    return [(s.rank, TeamStats.model_validate(s, from_attributes=True)) for s in standings]
@@ -1,34 +1,125 @@
 from beanie import PydanticObjectId
+from beanie.odm.queries.find import FindMany
 
 from src.modules.events.repository import events_repository
-from src.storages.mongo import Results
-from src.storages.mongo.results import ResultsSchema
+from src.modules.results.schemas import EventParticipation
+from src.modules.standings.repository import standings_repository
+from src.modules.versions.repository import versions_repository
+from src.storages.mongo import Counter, Event, Results
+from src.storages.mongo.projection import ProjectionSchema
+from src.storages.mongo.results import ResultsSchema, participant_keys, team_keys
+from src.storages.mongo.trigrams import rebuild_derived
+from src.storages.mongo.versioning import revised
+
+UNIQUE_PARTICIPANTS = "unique_participants"
+"Счётчик уникальных участников во всех результатах"
 
 
 class ResultRepository:
     async def create(self, results: ResultsSchema) -> Results:
-        return await Results.model_validate(results, from_attributes=True).insert()
+        document = Results.model_validate(results, from_attributes=True)
+        document.team_keys = team_keys(p.team for p in results.team_places or [])
+        document.participant_keys = participant_keys(results)
+        created = await document.revise().insert()
+        await versions_repository.bump(Results)
+        await standings_repository.on_results_changed(created)
+        await self._count_participants_change(created.id, [], created.participant_keys)
+        return created
 
     async def read(self, result_id: PydanticObjectId) -> Results | None:
         return await Results.get(result_id)
 
     async def update(self, result_id: PydanticObjectId, results: ResultsSchema) -> Results | None:
-        await Results.find_one({"_id": result_id}).update({"$set": results.model_dump()})
-        return await Results.get(result_id)
+        was = await Results.get(result_id)
+        derived = {
+            "team_keys": team_keys(p.team for p in results.team_places or []),
+            "participant_keys": participant_keys(results),
+        }
+        await Results.find_one({"_id": result_id}).update(revised({"$set": {**results.model_dump(), **derived}}))
+        await versions_repository.bump(Results)
+        updated = await Results.get(result_id)
+        await standings_repository.on_results_changed(was, updated)
+        if was is not None:
+            await self._count_participants_change(result_id, was.participant_keys, derived["participant_keys"])
+        return updated
+
+    async def rebuild_team_keys(self) -> None:
+        """
+        Recalculate `team_keys` of all results (backfill).
+        """
+        await rebuild_derived(
+            Results, "team_places", "team_keys", lambda places: team_keys(p.get("team") for p in places or [])
+        )
 
     async def read_all(self) -> list[Results]:
         return await Results.all().to_list()
 
+    async def read_all_raw(self) -> list[dict]:
+        """
+        All documents as stored, without validation (for `raw_json_response`).
+        """
+        return await Results.get_motor_collection().find().to_list(length=None)
+
+    def iterate_all(self, batch_size: int = 100) -> FindMany[Results]:
+        return Results.all(batch_size=batch_size)
+
     async def get_participant_count(self) -> int:
-        results = await Results.all().to_list()
-        unique_participants = set()
-        for result in results:
-            for solo_place in result.solo_places or []:
-                unique_participants.add(str(solo_place.participant))
-            for team_place in result.team_places or []:
-                for member in team_place.members:
-                    unique_participants.add(str(member))
-        return len(unique_participants)
+        """
+        Number of unique participants in all results, read from the maintained counter.
+        """
+        counter = await Counter.find_one(Counter.name == UNIQUE_PARTICIPANTS)
+        if counter is None:
+            return await self.rebuild_participant_count()
+        return counter.value
+
+    async def count_participants(self, event_ids: list[PydanticObjectId] | None = None) -> int:
+        """
+        Number of unique participants in results of the events (all results if `event_ids` is None).
+        """
+        pipeline = [
+            *([{"$match": {"event_id": {"$in": event_ids}}}] if event_ids is not None else []),
+            {"$unwind": "$participant_keys"},
+            {"$group": {"_id": "$participant_keys"}},
+            {"$count": "count"},
+        ]
+        counted = await Results.get_motor_collection().aggregate(pipeline).to_list(length=None)
+        return counted[0]["count"] if counted else 0
+
+    async def rebuild_participant_count(self) -> int:
+        """
+        Recalculate the counter of unique participants (backfill).
+        """
+        value = await self.count_participants()
+        await Counter.get_motor_collection().update_one(
+            {"name": UNIQUE_PARTICIPANTS}, {"$set": {"value": value}}, upsert=True
+        )
+        return value
+
+    async def rebuild_participant_keys(self) -> None:
+        """
+        Recalculate `participant_keys` of all results (backfill).
+        """
+        await rebuild_derived(
+            Results,
+            ["event_id", "event_title", "solo_places", "team_places"],
+            "participant_keys",
+            lambda doc: participant_keys(ResultsSchema.model_validate(doc)),
+        )
+
+    async def _count_participants_change(self, result_id: PydanticObjectId, was: list[str], now: list[str]) -> None:
+        """
+        Update the counter of unique participants after participants of the result changed from `was` to `now`:
+        a participant counts when it appears in no other result.
+        """
+        collection = Results.get_motor_collection()
+        delta = 0
+        for keys, sign in ((set(now) - set(was), 1), (set(was) - set(now), -1)):
+            for key in keys:
+                if await collection.find_one({"participant_keys": key, "_id": {"$ne": result_id}}, {"_id": 1}) is None:
+                    delta += sign
+        if delta:
+            # Without the counter it is calculated on the next read
+            await Counter.get_motor_collection().update_one({"name": UNIQUE_PARTICIPANTS}, {"$inc": {"value": delta}})
 
     async def read_for_participant(self, participant_id: PydanticObjectId) -> list[Results]:
         return await Results.find(
@@ -40,14 +131,73 @@ class ResultRepository:
             }
         ).to_list()
 
-    async def read_for_team(self, name: str) -> list[Results]:
-        return await Results.find({"team_places.team": name}).to_list()
+    async def read_participations(self, participant_id: PydanticObjectId) -> list[EventParticipation]:
+        """
+        Participations of the participant, the latest events first: only the participant's own solo and team places
+        are taken from each result, joined with dates and disciplines of the event.
+        """
+        pipeline = [
+            {
+                "$match": {
+                    "$or": [
+                        {"solo_places.participant.id": participant_id},
+                        {"team_places.members.id": participant_id},
+                    ]
+                }
+            },
+            {
+                "$project": {
+                    "event_id": 1,
+                    "event_title": 1,
+                    "solo_places": {
+                        "$filter": {
+                            "input": {"$ifNull": ["$solo_places", []]},
+                            "as": "place",
+                            "cond": {"$eq": ["$$place.participant.id", participant_id]},
+                        }
+                    },
+                    "team_places": {
+                        "$filter": {
+                            "input": {"$ifNull": ["$team_places", []]},
+                            "as": "place",
+                            "cond": {"$in": [participant_id, {"$ifNull": ["$$place.members.id", []]}]},
+                        }
+                    },
+                }
+            },
+            {
+                "$lookup": {
+                    "from": Event.get_collection_name(),
+                    "localField": "event_id",
+                    "foreignField": "_id",
+                    "as": "event",
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "result_id": "$_id",
+                    "event_id": 1,
+                    "event_title": 1,
+                    "solo_place": {"$first": "$solo_places"},
+                    "team_place": {"$first": "$team_places"},
+                    "event_start_date": {"$first": "$event.start_date"},
+                    "event_end_date": {"$first": "$event.end_date"},
+                    "event_discipline": {"$ifNull": [{"$first": "$event.discipline"}, []]},
+                }
+            },
+            {"$sort": {"event_start_date": -1, "result_id": 1}},
+        ]
+        docs = await Results.get_motor_collection().aggregate(pipeline).to_list(length=None)
+        return [EventParticipation.model_validate(doc) for doc in docs]
 
     async def read_for_event(self, event_id: PydanticObjectId) -> Results | None:
         return await Results.find({"event_id": event_id}).first_or_none()
 
-    async def read_for_events(self, *event_ids: PydanticObjectId) -> list[Results]:
-        return await Results.find({"event_id": {"$in": event_ids}}).to_list()
+    async def read_for_events(
+        self, *event_ids: PydanticObjectId, projection: type[ProjectionSchema] | None = None
+    ) -> list[Results] | list[ProjectionSchema]:
+        return await Results.find({"event_id": {"$in": event_ids}}, projection_model=projection).to_list()
 
     async def read_for_federation(self, federation_id: PydanticObjectId) -> list[Results]:
         events_ids = await events_repository.read_for_federation_only_ids(federation_id)
@@ -55,13 +205,18 @@ class ResultRepository:
         return results
 
     async def replace_id_with_none(self, participant_id: PydanticObjectId) -> None:
+        affected_ids = [result.id for result in await self.read_for_participant(participant_id)]
         await Results.find({"solo_places.participant.id": participant_id}).update(
-            {"$set": {"solo_places.$.participant.id": None}}
+            revised({"$set": {"solo_places.$.participant.id": None}})
         )
         await Results.find({"team_places.members.id": participant_id}).update(
-            {"$set": {"team_places.$[].members.$[elem].id": None}},
+            revised({"$set": {"team_places.$[].members.$[elem].id": None}}),
             array_filters=[{"elem.id": participant_id}],
         )
+        await versions_repository.bump(Results)
+        for result in await Results.find({"_id": {"$in": affected_ids}}).to_list():
+            await Results.find_one({"_id": result.id}).update({"$set": {"participant_keys": participant_keys(result)}})
+        await self.rebuild_participant_count()
 
 
 result_repository: ResultRepository = ResultRepository()
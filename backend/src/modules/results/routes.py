@@ -1,12 +1,17 @@
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 
+from src.api.conditional import document_etag
 from src.api.dependencies import USER_AUTH
+from src.api.projection import FIELDS_RESPONSE, projected_response
+from src.api.raw_json import raw_json_response
+from src.api.streaming import NDJSON_RESPONSE, ndjson_response, wants_ndjson
 from src.modules.events.repository import events_repository
 from src.modules.results.repository import result_repository
 from src.modules.users.repository import user_repository
 from src.storages.mongo import Results
-from src.storages.mongo.results import ResultsSchema
+from src.storages.mongo.projection import resolve_projection
+from src.storages.mongo.results import RESULTS_PROJECTIONS, ResultsSchema
 from src.storages.mongo.users import UserRole
 
 router = APIRouter(prefix="/results", tags=["Results"])
@@ -38,15 +43,40 @@ async def upload_results(results: ResultsSchema, auth: USER_AUTH) -> Results:
         raise HTTPException(status_code=403, detail="Only admin or related federation can update event")
 
 
-@router.get("/for-event", responses={200: {"description": "Results about event"}})
+@router.get("/", responses={200: {"description": "All results", **NDJSON_RESPONSE}})
+async def get_all_results(request: Request, stream: bool = False) -> list[Results]:
+    """
+    Get results of all events.
+
+    With `Accept: application/x-ndjson` or `?stream=1` results are streamed one per line as they are read.
+    """
+    if wants_ndjson(request, stream):
+        return ndjson_response(result_repository.iterate_all())
+    return raw_json_response(Results, await result_repository.read_all_raw())
+
+
+@router.get(
+    "/for-event",
+    dependencies=[document_etag(Results, param="event_id", field="event_id")],
+    responses={200: {"description": "Results about event"}, 304: {"description": "Not modified since `If-None-Match`"}},
+)
 async def get_result_for_event(event_id: PydanticObjectId) -> Results | None:
     r = await result_repository.read_for_event(event_id)
     return r
 
 
-@router.post("/for-events", responses={200: {"description": "Results for events"}})
-async def get_results_for_events(event_ids: list[PydanticObjectId]) -> list[Results]:
-    r = await result_repository.read_for_events(*event_ids)
+@router.post("/for-events", responses={200: {"description": "Results for events"}, **FIELDS_RESPONSE})
+async def get_results_for_events(event_ids: list[PydanticObjectId], fields: str | None = None) -> list[Results]:
+    """
+    Results for events. `fields` limits fields of results: a preset (`card`) or comma-separated field names.
+    """
+    try:
+        projection = resolve_projection(Results, RESULTS_PROJECTIONS, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    r = await result_repository.read_for_events(*event_ids, projection=projection)
+    if projection:
+        return projected_response(r)
     return r
 
 
@@ -0,0 +1,16 @@
+import datetime
+
+from src.storages.mongo.standings import Participation
+
+
+class EventParticipation(Participation):
+    """
+    Участие с местом только этого участника и сведениями о мероприятии.
+    """
+
+    event_start_date: datetime.datetime | None = None
+    "Дата начала мероприятия"
+    event_end_date: datetime.datetime | None = None
+    "Дата окончания мероприятия"
+    event_discipline: list[str] = []
+    "Дисциплины мероприятия"
@@ -0,0 +1,430 @@
+__all__ = ["standings_repository"]
+
+import re
+from collections.abc import Iterable, Iterator
+
+from beanie import Document, PydanticObjectId
+from pymongo import DeleteMany, UpdateOne
+
+from src.modules.events.repository import events_repository
+from src.modules.events.schemas import Filters
+from src.storages.mongo import Participant, Results
+from src.storages.mongo.results import team_key
+from src.storages.mongo.standings import ParticipantStanding, Participation, TeamStanding
+from src.storages.mongo.trigrams import name_keys, normalize_text
+
+MEDALS = {1: "golds", 2: "silvers", 3: "bronzes"}
+"Поле счётчика медали по месту"
+SCORE_ORDER = [("golds", -1), ("silvers", -1), ("bronzes", -1), ("total", -1)]
+"Порядок рейтинга: медали, затем количество участий"
+_SCORE_FIELDS = [field for field, _ in SCORE_ORDER]
+_SCORE = {
+    "$add": [
+        {"$multiply": ["$golds", 10**12]},
+        {"$multiply": ["$silvers", 10**8]},
+        {"$multiply": ["$bronzes", 10**4]},
+        "$total",
+    ]
+}
+"SCORE_ORDER одним числом (до 10^4 участий каждого вида): $rank принимает sortBy только из одного поля"
+
+
+def _participations(result: Results) -> Iterator[tuple[PydanticObjectId, Participation, int]]:
+    """
+    (participant id, participation, place) for every solo place and team member with a known id.
+    """
+    for solo in result.solo_places or []:
+        if solo.participant.id:
+            yield (
+                solo.participant.id,
+                Participation(
+                    result_id=result.id, event_id=result.event_id, event_title=result.event_title, solo_place=solo
+                ),
+                solo.place,
+            )
+    for team in result.team_places or []:
+        for member in team.members:
+            if member.id:
+                yield (
+                    member.id,
+                    Participation(
+                        result_id=result.id, event_id=result.event_id, event_title=result.event_title, team_place=team
+                    ),
+                    team.place,
+                )
+
+
+def _team_participations(result: Results) -> Iterator[tuple[str, str, Participation, int]]:
+    """
+    (team key, team name, participation, place) for every team place with a non-empty name.
+    """
+    for team in result.team_places or []:
+        if key := team_key(team.team):
+            yield (
+                key,
+                team.team.strip(),
+                Participation(
+                    result_id=result.id, event_id=result.event_id, event_title=result.event_title, team_place=team
+                ),
+                team.place,
+            )
+
+
+def _count(standing: ParticipantStanding | TeamStanding, participation: Participation, place: int) -> None:
+    standing.participations.append(participation)
+    standing.total += 1
+    if medal := MEDALS.get(place):
+        setattr(standing, medal, getattr(standing, medal) + 1)
+
+
+def _score(standing: dict | ParticipantStanding | TeamStanding) -> tuple[int, ...]:
+    if isinstance(standing, dict):
+        return tuple(standing.get(field, 0) for field in _SCORE_FIELDS)
+    return tuple(getattr(standing, field) for field in _SCORE_FIELDS)
+
+
+def _compare(score: tuple[int, ...], op: str, or_equal: bool = False) -> dict:
+    """
+    Condition for standings with the score greater (`op` is `$gt`) or less (`$lt`) than `score` in the rating order.
+    Every clause is a range of the score index.
+    """
+    clauses = []
+    for i, field in enumerate(_SCORE_FIELDS):
+        last = i == len(_SCORE_FIELDS) - 1
+        bound = {f"{op}e" if last and or_equal else op: score[i]}
+        clauses.append({**dict(zip(_SCORE_FIELDS[:i], score[:i])), field: bound})
+    return {"$or": clauses}
+
+
+def _prefix(query: str | None) -> str:
+    return normalize_text(query) if query else ""
+
+
+def _participation(place: str, field: str) -> dict:
+    return {"result_id": "$_id", "event_id": "$event_id", "event_title": "$event_title", field: place}
+
+
+_SOLO_ENTRIES = {
+    "$map": {
+        "input": {"$ifNull": ["$solo_places", []]},
+        "as": "solo",
+        "in": {
+            "id": "$$solo.participant.id",
+            "place": "$$solo.place",
+            "participation": _participation("$$solo", "solo_place"),
+        },
+    }
+}
+"(participant id, place, participation) for every solo place of a result"
+_MEMBER_ENTRIES = {
+    "$reduce": {
+        "input": {"$ifNull": ["$team_places", []]},
+        "initialValue": [],
+        "in": {
+            "$concatArrays": [
+                "$$value",
+                {
+                    "$map": {
+                        "input": {"$ifNull": ["$$this.members", []]},
+                        "as": "member",
+                        "in": {
+                            "id": "$$member.id",
+                            "place": "$$this.place",
+                            "participation": _participation("$$this", "team_place"),
+                        },
+                    }
+                },
+            ]
+        },
+    }
+}
+"(participant id, place, participation) for every member of every team place of a result"
+_TEAM_ENTRIES = {
+    "$map": {
+        "input": {"$zip": {"inputs": [{"$ifNull": ["$team_places", []]}, {"$ifNull": ["$team_keys", []]}]}},
+        "as": "pair",
+        "in": {
+            "$let": {
+                "vars": {"team": {"$arrayElemAt": ["$$pair", 0]}, "key": {"$arrayElemAt": ["$$pair", 1]}},
+                "in": {
+                    "key": "$$key",
+                    "name": {"$trim": {"input": "$$team.team"}},
+                    "place": "$$team.place",
+                    "participation": _participation("$$team", "team_place"),
+                },
+            }
+        },
+    }
+}
+"(team key, team name, place, participation) for every team place of a result, `team_keys` are aligned with places"
+_TALLY = {
+    "participations": {"$push": "$entries.participation"},
+    "total": {"$sum": 1},
+    **{medal: {"$sum": {"$cond": [{"$eq": ["$entries.place", place]}, 1, 0]}} for place, medal in MEDALS.items()},
+}
+"Group accumulators of standings over unwound `entries`"
+
+
+# noinspection PyMethodMayBeStatic
+class StandingsRepository:
+    async def read_participants(
+        self, skip: int = 0, limit: int = 100, query: str | None = None, scope: Filters | None = None
+    ) -> tuple[list[ParticipantStanding], int]:
+        """
+        Page of the participant leaderboard by rank and the number of participants matching `query` (the beginning
+        of any word of the name). With `scope` only results of events matching it count, and the leaderboard
+        is computed by aggregation instead of being read from the maintained collection.
+        """
+        if scope is not None:
+            pipeline = [
+                {"$project": {"entries": {"$concatArrays": [_SOLO_ENTRIES, _MEMBER_ENTRIES]}}},
+                {"$unwind": "$entries"},
+                {"$match": {"entries.id": {"$ne": None}}},
+                {"$group": {"_id": "$entries.id", **_TALLY}},
+                {
+                    "$lookup": {
+                        "from": Participant.get_collection_name(),
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "participant",
+                    }
+                },
+                {
+                    "$set": {
+                        "name": {"$ifNull": [{"$first": "$participant.name"}, ""]},
+                        "name_keys": {"$ifNull": [{"$first": "$participant.name_keys"}, []]},
+                    }
+                },
+                {"$project": {"participant": 0}},
+            ]
+            match = {"name_keys": {"$regex": f"^{re.escape(prefix)}"}} if (prefix := _prefix(query)) else None
+            return await self._rank(ParticipantStanding, scope, pipeline, match, skip, limit)
+        q = ParticipantStanding.find()
+        if prefix := _prefix(query):
+            q = q.find({"name_keys": {"$regex": f"^{re.escape(prefix)}"}})
+        return await q.sort(("rank", 1), ("name", 1)).skip(skip).limit(limit).to_list(), await q.count()
+
+    async def read_teams(
+        self, skip: int = 0, limit: int = 100, query: str | None = None, scope: Filters | None = None
+    ) -> tuple[list[TeamStanding], int]:
+        """
+        Page of the team leaderboard by rank and the number of teams matching `query`, see `read_participants`.
+        """
+        if scope is not None:
+            pipeline = [
+                {"$project": {"entries": _TEAM_ENTRIES}},
+                {"$unwind": "$entries"},
+                {"$match": {"entries.key": {"$nin": [None, ""]}}},
+                {"$group": {"_id": "$entries.key", "name": {"$first": "$entries.name"}, **_TALLY}},
+                {"$set": {"key": "$_id"}},
+                {"$project": {"_id": 0}},
+            ]
+            # Keys are normalized without transliteration, so the query is matched at word starts of the key
+            key_prefix = team_key(query)
+            match = {"key": {"$regex": f"(^| ){re.escape(key_prefix)}"}} if key_prefix else None
+            return await self._rank(TeamStanding, scope, pipeline, match, skip, limit)
+        q = TeamStanding.find()
+        if prefix := _prefix(query):
+            q = q.find({"name_keys": {"$regex": f"^{re.escape(prefix)}"}})
+        return await q.sort(("rank", 1), ("name", 1)).skip(skip).limit(limit).to_list(), await q.count()
+
+    async def _rank[T: ParticipantStanding | TeamStanding](
+        self,
+        document: type[T],
+        scope: Filters,
+        pipeline: list[dict],
+        match: dict | None,
+        skip: int,
+        limit: int,
+    ) -> tuple[list[T], int]:
+        """
+        Run `pipeline` tallying standings over results of events in `scope`, rank them inside the database
+        and return the requested page of those matching `match`, with their count.
+        """
+        event_ids = await events_repository.read_ids_with_filters(scope)
+        pipeline = [
+            {"$match": {"event_id": {"$in": event_ids}}},
+            *pipeline,
+            {"$set": {"score": _SCORE}},
+            {"$setWindowFields": {"sortBy": {"score": -1}, "output": {"rank": {"$rank": {}}}}},
+            {"$project": {"score": 0}},
+            *([{"$match": match}] if match else []),
+            {
+                "$facet": {
+                    "total": [{"$count": "count"}],
+                    "page": [{"$sort": {"rank": 1, "name": 1}}, {"$skip": skip}, {"$limit": limit}],
+                }
+            },
+        ]
+        [facets] = await Results.get_motor_collection().aggregate(pipeline).to_list(length=None)
+        total = facets["total"][0]["count"] if facets["total"] else 0
+        return [document.model_validate(doc) for doc in facets["page"]], total
+
+    async def read_team(self, name: str) -> TeamStanding | None:
+        return await TeamStanding.find_one({"key": team_key(name)})
+
+    async def on_results_changed(self, *results: Results | None) -> None:
+        """
+        Recalculate standings of participants and teams mentioned in `results` (previous and new versions
+        of the document).
+        """
+        results = [result for result in results if result]
+        await self.refresh_participants(id_ for result in results for id_, _, _ in _participations(result))
+        await self.refresh_teams(key for result in results for key, _, _, _ in _team_participations(result))
+
+    async def refresh_participants(self, ids: Iterable[PydanticObjectId]) -> None:
+        """
+        Recalculate standings of the participants from their results and update ranks affected by the change.
+        """
+        ids = set(ids)
+        if not ids:
+            return
+        standings: dict[PydanticObjectId, ParticipantStanding] = {}
+        results = Results.find(
+            {
+                "$or": [
+                    {"solo_places.participant.id": {"$in": list(ids)}},
+                    {"team_places.members.id": {"$in": list(ids)}},
+                ]
+            }
+        )
+        async for result in results:
+            self._tally(standings, result, only=ids)
+        await self._set_names(standings)
+        await self._save_ranked(ParticipantStanding, "_id", ids, standings)
+
+    async def refresh_teams(self, keys: Iterable[str]) -> None:
+        """
+        Recalculate standings of the teams (by normalized names) from their results and update ranks affected
+        by the change.
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        standings: dict[str, TeamStanding] = {}
+        async for result in Results.find({"team_keys": {"$in": list(keys)}}):
+            self._tally_teams(standings, result, only=keys)
+        await self._save_ranked(TeamStanding, "key", keys, standings)
+
+    async def rename_participant(self, id_: PydanticObjectId, name: str) -> None:
+        await ParticipantStanding.find_one({"_id": id_}).update({"$set": {"name": name, "name_keys": name_keys(name)}})
+
+    async def rebuild_participants(self, batch: int = 1000) -> None:
+        """
+        Recalculate `ParticipantStanding` collection from all results (backfill).
+        """
+        standings: dict[PydanticObjectId, ParticipantStanding] = {}
+        async for result in Results.all():
+            self._tally(standings, result)
+        await self._set_names(standings)
+        await ParticipantStanding.delete_all()
+        values = list(standings.values())
+        for i in range(0, len(values), batch):
+            await ParticipantStanding.insert_many(values[i : i + batch])
+        await self._rerank(ParticipantStanding)
+
+    async def rebuild_teams(self, batch: int = 1000) -> None:
+        """
+        Recalculate `TeamStanding` collection from all results (backfill).
+        """
+        standings: dict[str, TeamStanding] = {}
+        async for result in Results.all():
+            self._tally_teams(standings, result)
+        await TeamStanding.delete_all()
+        values = list(standings.values())
+        for i in range(0, len(values), batch):
+            await TeamStanding.insert_many(values[i : i + batch])
+        await self._rerank(TeamStanding)
+
+    def _tally(
+        self,
+        standings: dict[PydanticObjectId, ParticipantStanding],
+        result: Results,
+        only: set[PydanticObjectId] | None = None,
+    ) -> None:
+        for id_, participation, place in _participations(result):
+            if only is not None and id_ not in only:
+                continue
+            _count(standings.setdefault(id_, ParticipantStanding(id=id_)), participation, place)
+
+    def _tally_teams(self, standings: dict[str, TeamStanding], result: Results, only: set[str] | None = None) -> None:
+        for key, name, participation, place in _team_participations(result):
+            if only is not None and key not in only:
+                continue
+            if key not in standings:
+                standings[key] = TeamStanding(key=key, name=name, name_keys=name_keys(name))
+            _count(standings[key], participation, place)
+
+    async def _set_names(self, standings: dict[PydanticObjectId, ParticipantStanding]) -> None:
+        cursor = Participant.get_motor_collection().find({"_id": {"$in": list(standings)}}, {"name": 1})
+        async for doc in cursor:
+            standing = standings[doc["_id"]]
+            standing.name = doc["name"]
+            standing.name_keys = name_keys(doc["name"])
+
+    async def _save_ranked[K](
+        self,
+        document: type[Document],
+        key_field: str,
+        touched: set[K],
+        standings: dict[K, ParticipantStanding | TeamStanding],
+    ) -> None:
+        """
+        Write recalculated `standings` of the `touched` keys (the ones missing in `standings` are deleted) with their
+        ranks, and shift ranks of the other standings by the places taken or freed, without reading them:
+        a standing ranks one lower for every touched one that rose above it and one higher for every one that fell
+        below it or was deleted. Ranks of touched standings are counted over the score index.
+        """
+        collection = document.get_motor_collection()
+        cursor = collection.find({key_field: {"$in": list(touched)}}, {key_field: 1, **dict.fromkeys(_SCORE_FIELDS, 1)})
+        old = {doc[key_field]: _score(doc) async for doc in cursor}
+        new = {key: _score(standing) for key, standing in standings.items()}
+        others = {key_field: {"$nin": list(touched)}}
+
+        operations = []
+        for key, standing in standings.items():
+            higher = await collection.count_documents({**others, **_compare(new[key], "$gt")})
+            rank = 1 + higher + sum(score > new[key] for score in new.values())
+            fields = {**standing.model_dump(exclude={"id", "rank"}), "name_keys": standing.name_keys, "rank": rank}
+            operations.append(UpdateOne({key_field: key}, {"$set": fields}, upsert=True))
+        if removed := touched - standings.keys():
+            operations.append(DeleteMany({key_field: {"$in": list(removed)}}))
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+
+        for key in touched:
+            was, now = old.get(key), new.get(key)
+            if was == now:
+                continue
+            # Standings with scores in [lower, upper) change their place
+            lower, upper, shift = (was, now, 1) if was is None or (now is not None and now > was) else (now, was, -1)
+            band = [_compare(upper, "$lt")]
+            if lower is not None:
+                band.append(_compare(lower, "$gt", or_equal=True))
+            await collection.update_many({**others, "$and": band}, {"$inc": {"rank": shift}})
+
+    async def _rerank(self, document: type[Document], batch: int = 1000) -> None:
+        """
+        Assign places by the score order: equal scores share the place, the next one is counted by position.
+        Only changed places are written. Reads the whole collection, so it is used only for rebuilds.
+        """
+        collection = document.get_motor_collection()
+        fields = [field for field, _ in SCORE_ORDER]
+        cursor = collection.find({}, {**dict.fromkeys(fields, 1), "rank": 1}).sort(SCORE_ORDER)
+        updates = []
+        position, rank, previous = 0, 0, None
+        async for doc in cursor:
+            position += 1
+            score = tuple(doc.get(field, 0) for field in fields)
+            if score != previous:
+                rank, previous = position, score
+            if doc.get("rank") != rank:
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"rank": rank}}))
+            if len(updates) >= batch:
+                await collection.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            await collection.bulk_write(updates, ordered=False)
+
+
+standings_repository: StandingsRepository = StandingsRepository()
@@ -1,6 +1,7 @@
 __all__ = ["user_repository"]
 
 from beanie import PydanticObjectId
+from beanie.odm.queries.find import FindMany
 
 from src.modules.users.schemas import CreateUser, UpdateUser
 from src.storages.mongo.users import User, UserRole
@@ -41,6 +42,9 @@ class UserRepository:
     async def read_all(self) -> list[User]:
         return await User.all().to_list()
 
+    def iterate_all(self, batch_size: int = 500) -> FindMany[User]:
+        return User.all(batch_size=batch_size)
+
     async def read_all_admins(self) -> list[User]:
         return await User.find(User.role == UserRole.ADMIN).to_list()
 
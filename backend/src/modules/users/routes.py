@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException, Request
 
 from src.api.dependencies import USER_AUTH
 from src.api.exceptions import IncorrectCredentialsException
+from src.api.streaming import NDJSON_RESPONSE, ndjson_response, wants_ndjson
 from src.modules.users.repository import user_repository
 from src.modules.users.schemas import CreateUser, UpdateUser, ViewUser
 from src.storages.mongo.users import UserRole
@@ -82,14 +83,24 @@ async def create_user(data: CreateUser, auth: USER_AUTH) -> ViewUser:
 
 
 @router.get(
-    "/", responses={200: {"description": "Info about all users"}, 403: {"description": "Only admin can get users"}}
+    "/",
+    responses={
+        200: {"description": "Info about all users", **NDJSON_RESPONSE},
+        403: {"description": "Only admin can get users"},
+    },
 )
-async def get_all_users(auth: USER_AUTH) -> list[ViewUser]:
+async def get_all_users(auth: USER_AUTH, request: Request, stream: bool = False) -> list[ViewUser]:
     """
     Get info about all users.
+
+    With `Accept: application/x-ndjson` or `?stream=1` users are streamed one per line as they are read.
     """
     user = await user_repository.read(auth.user_id)
     if user.role == UserRole.ADMIN:
+        if wants_ndjson(request, stream):
+            return ndjson_response(
+                user_repository.iterate_all(), convert=lambda u: ViewUser.model_validate(u, from_attributes=True)
+            )
         return await user_repository.read_all()
     else:
         raise HTTPException(status_code=403, detail="Only admin can get users")
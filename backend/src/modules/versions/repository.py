@@ -0,0 +1,28 @@
+__all__ = ["versions_repository"]
+
+import datetime
+
+from beanie import Document
+
+from src.storages.mongo.versioning import CollectionVersion
+
+
+# noinspection PyMethodMayBeStatic
+class VersionsRepository:
+    async def read(self, document: type[Document]) -> CollectionVersion | None:
+        return await CollectionVersion.find_one(CollectionVersion.collection == document.get_collection_name())
+
+    async def bump(self, *documents: type[Document]) -> None:
+        """
+        Increment version counters of collections of the documents (called on every write to them).
+        """
+        now = datetime.datetime.now(datetime.UTC)
+        for document in documents:
+            await CollectionVersion.get_motor_collection().update_one(
+                {"collection": document.get_collection_name()},
+                {"$inc": {"version": 1}, "$set": {"updated_at": now}},
+                upsert=True,
+            )
+
+
+versions_repository: VersionsRepository = VersionsRepository()
@@ -2,17 +2,36 @@ from typing import cast
 
 from beanie import Document, View
 
+from src.storages.mongo.counters import Counter
 from src.storages.mongo.email import EmailFlow
 from src.storages.mongo.events import Event
 from src.storages.mongo.federation import Federation
 from src.storages.mongo.feedback import Feedback
+from src.storages.mongo.location_facet import LocationFacet
 from src.storages.mongo.notify import Notify
 from src.storages.mongo.participant import Participant
 from src.storages.mongo.results import Results
 from src.storages.mongo.selection import Selection
+from src.storages.mongo.standings import ParticipantStanding, TeamStanding
 from src.storages.mongo.users import User
+from src.storages.mongo.versioning import CollectionVersion
 
 document_models = cast(
     list[type[Document] | type[View] | str],
-    [User, Federation, Event, Results, Selection, Feedback, Notify, EmailFlow, Participant],
+    [
+        User,
+        Federation,
+        Event,
+        Results,
+        Selection,
+        Feedback,
+        Notify,
+        EmailFlow,
+        Participant,
+        LocationFacet,
+        CollectionVersion,
+        ParticipantStanding,
+        TeamStanding,
+        Counter,
+    ],
 )
@@ -0,0 +1,22 @@
+__all__ = ["Counter", "CounterSchema"]
+
+from pymongo import IndexModel
+
+from src.pydantic_base import BaseSchema
+from src.storages.mongo.__base__ import CustomDocument
+
+
+class CounterSchema(BaseSchema):
+    """
+    Значение, поддерживаемое при изменении других коллекций, чтобы не пересчитывать его при чтении.
+    """
+
+    name: str
+    "Название счётчика"
+    value: int = 0
+    "Текущее значение"
+
+
+class Counter(CounterSchema, CustomDocument):
+    class Settings(CustomDocument.Settings):
+        indexes = [IndexModel("name", unique=True)]
@@ -4,10 +4,13 @@ from typing import Literal
 
 import pymongo
 from beanie import PydanticObjectId
+from pydantic import Field
 from pymongo import IndexModel
 
 from src.pydantic_base import BaseSchema
 from src.storages.mongo.__base__ import CustomDocument
+from src.storages.mongo.projection import projection_model
+from src.storages.mongo.versioning import Versioned
 
 
 class EventLocation(BaseSchema):
@@ -127,7 +130,12 @@ class EventSchema(BaseSchema):
     "Уровень мероприятия"
 
 
-class Event(EventSchema, CustomDocument):
+class Event(EventSchema, Versioned, CustomDocument):
+    trigrams: list[str] = Field(default_factory=list, exclude=True)
+    "Триграммы названия для нечёткого поиска (заполняются при записи)"
+    title_key: str = Field(default="", exclude=True)
+    "Нормализованное название для поиска по началу (заполняется при записи)"
+
     class Settings:
         indexes = [
             IndexModel(
@@ -141,4 +149,35 @@ class Event(EventSchema, CustomDocument):
                 default_language="russian",
                 name="text_index",
             ),
+            # Equality filters first, then the field used for sorting and date ranges
+            IndexModel([("status", pymongo.ASCENDING), ("start_date", pymongo.ASCENDING)]),
+            IndexModel([("discipline", pymongo.ASCENDING), ("start_date", pymongo.ASCENDING)]),
+            IndexModel([("host_federation", pymongo.ASCENDING), ("start_date", pymongo.ASCENDING)]),
+            IndexModel(
+                [
+                    ("location.country", pymongo.ASCENDING),
+                    ("location.region", pymongo.ASCENDING),
+                    ("location.city", pymongo.ASCENDING),
+                ]
+            ),
+            IndexModel([("gender", pymongo.ASCENDING)]),
+            IndexModel([("title", pymongo.ASCENDING)]),
+            # Range filters
+            IndexModel([("start_date", pymongo.ASCENDING), ("end_date", pymongo.ASCENDING)]),
+            IndexModel([("end_date", pymongo.ASCENDING), ("start_date", pymongo.ASCENDING)]),
+            IndexModel([("age_min", pymongo.ASCENDING), ("age_max", pymongo.ASCENDING)]),
+            IndexModel([("age_max", pymongo.ASCENDING), ("age_min", pymongo.ASCENDING)]),
+            IndexModel([("participant_count", pymongo.ASCENDING)]),
+            # Fuzzy search
+            IndexModel([("trigrams", pymongo.ASCENDING)]),
+            IndexModel([("title_key", pymongo.ASCENDING)]),
         ]
+
+
+EventCard = projection_model(
+    Event, ("title", "status", "discipline", "start_date", "end_date", "location", "level"), "EventCard"
+)
+"Карточка мероприятия в списке: без описания и служебных полей"
+EventCalendar = projection_model(Event, ("title", "start_date", "end_date"), "EventCalendar")
+"Мероприятие в календаре"
+EVENT_PROJECTIONS = {"card": EventCard, "calendar": EventCalendar}
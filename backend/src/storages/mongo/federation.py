@@ -2,9 +2,11 @@ import datetime
 from enum import StrEnum
 
 from pydantic import Field
+from pymongo import IndexModel
 
 from src.pydantic_base import BaseSchema
 from src.storages.mongo.__base__ import CustomDocument
+from src.storages.mongo.versioning import Versioned
 
 
 class StatusEnum(StrEnum):
@@ -64,5 +66,6 @@ class FederationSchema(BaseSchema):
     "Было ли уведомление о взаимодействии"
 
 
-class Federation(FederationSchema, CustomDocument):
-    pass
+class Federation(FederationSchema, Versioned, CustomDocument):
+    class Settings(CustomDocument.Settings):
+        indexes = [IndexModel("region")]
@@ -0,0 +1,60 @@
+__all__ = ["decode_cursor", "encode_cursor", "keyset_match"]
+
+import base64
+import binascii
+from typing import Any
+
+from bson import json_util
+from bson.errors import InvalidBSON
+
+# Same as the database client: datetimes are timezone-aware
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS.with_options(tz_aware=True)
+
+
+def encode_cursor(state: dict[str, Any]) -> str:
+    """
+    Pack keyset pagination state (last sort key values and helpers) into an opaque url-safe string.
+    """
+    return base64.urlsafe_b64encode(json_util.dumps(state, json_options=JSON_OPTIONS).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """
+    Unpack string produced by `encode_cursor`.
+
+    :raises ValueError: if cursor is malformed
+    """
+    try:
+        state = json_util.loads(base64.urlsafe_b64decode(cursor.encode()), json_options=JSON_OPTIONS)
+    except (binascii.Error, UnicodeDecodeError, InvalidBSON, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(state, dict) or not isinstance(state.get("key"), list):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+def keyset_match(keys: list[tuple[str, int]], values: list[Any], expr: bool = False) -> dict:
+    """
+    Condition for documents strictly after `values` in order given by `keys` ((field, direction) pairs).
+
+    With plain query operators the condition can be served by an index range scan. `expr=True` compares
+    with aggregation expressions instead: use it for computed or nullable fields (missing is treated as null).
+    """
+    if len(keys) != len(values):
+        raise ValueError("Invalid cursor")
+
+    branches = []
+    for i, (field, direction) in enumerate(keys):
+        op = "$gt" if direction == 1 else "$lt"
+        if expr:
+            branch = [{"$eq": [{"$ifNull": [f"${f}", None]}, v]} for (f, _), v in zip(keys[:i], values)]
+            branch.append({op: [{"$ifNull": [f"${field}", None]}, values[i]]})
+            branches.append({"$and": branch})
+        else:
+            branch = {f: v for (f, _), v in zip(keys[:i], values)}
+            branch[field] = {op: values[i]}
+            branches.append(branch)
+
+    if expr:
+        return {"$expr": {"$or": branches}}
+    return {"$or": branches}
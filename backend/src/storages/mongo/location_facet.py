@@ -0,0 +1,30 @@
+import pymongo
+from pymongo import IndexModel
+
+from src.pydantic_base import BaseSchema
+from src.storages.mongo.__base__ import CustomDocument
+
+
+class LocationFacetSchema(BaseSchema):
+    """
+    Место проведения, встречающееся в событиях. Поддерживается при изменении событий.
+    """
+
+    country: str
+    "Название страны"
+    region: str | None = None
+    "Название региона"
+    city: str | None = None
+    "Название города"
+    events: int = 0
+    "Количество событий с этим местом проведения"
+
+
+class LocationFacet(LocationFacetSchema, CustomDocument):
+    class Settings(CustomDocument.Settings):
+        indexes = [
+            IndexModel(
+                [("country", pymongo.ASCENDING), ("region", pymongo.ASCENDING), ("city", pymongo.ASCENDING)],
+                unique=True,
+            ),
+        ]
@@ -3,6 +3,7 @@ from typing import Annotated, Literal
 
 from beanie import PydanticObjectId
 from pydantic import Discriminator, Field
+from pymongo import IndexModel
 
 from src.pydantic_base import BaseSchema
 from src.storages.mongo.__base__ import CustomDocument
@@ -96,4 +97,8 @@ class NotifySchema(BaseSchema):
 
 
 class Notify(NotifySchema, CustomDocument):
-    pass
+    class Settings(CustomDocument.Settings):
+        indexes = [
+            IndexModel("for_admin"),
+            IndexModel("for_federation"),
+        ]
@@ -1,10 +1,15 @@
 import datetime
 
+import pymongo
 from beanie import PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel
 
 from src.pydantic_base import BaseSchema
 from src.storages.mongo.__base__ import CustomDocument
 from src.storages.mongo.events import Gender
+from src.storages.mongo.projection import projection_model
+from src.storages.mongo.versioning import Versioned
 
 
 class ParticipantSchema(BaseSchema):
@@ -22,5 +27,21 @@ class ParticipantSchema(BaseSchema):
     "Разряд: МС; КМС; I разряд; II разряд; III спортивный разряд; I юношеский разряд; II юношеский разряд; III юношеский разряд."
 
 
-class Participant(ParticipantSchema, CustomDocument):
-    pass
+class Participant(ParticipantSchema, Versioned, CustomDocument):
+    trigrams: list[str] = Field(default_factory=list, exclude=True)
+    "Триграммы ФИО для нечёткого поиска (заполняются при записи)"
+    name_keys: list[str] = Field(default_factory=list, exclude=True)
+    "Нормализованное ФИО и его перестановки по словам для подсказок по началу (заполняются при записи)"
+
+    class Settings(CustomDocument.Settings):
+        indexes = [
+            IndexModel([("name", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+            IndexModel([("related_federation", pymongo.ASCENDING), ("name", pymongo.ASCENDING)]),
+            IndexModel([("trigrams", pymongo.ASCENDING)]),
+            IndexModel([("name_keys", pymongo.ASCENDING)]),
+        ]
+
+
+ParticipantCard = projection_model(Participant, ("name", "related_federation", "gender", "rank"), "ParticipantCard")
+"Карточка участника: без контактов и даты рождения"
+PARTICIPANT_PROJECTIONS = {"card": ParticipantCard}
@@ -0,0 +1,59 @@
+__all__ = ["ProjectionSchema", "projection_model", "resolve_projection"]
+
+import functools
+
+from beanie.odm.utils.projection import get_projection
+from pydantic import BaseModel, Field, create_model
+
+from src.pydantic_base import BaseSchema
+from src.storages.mongo.__base__ import MongoDbId
+
+
+class ProjectionSchema(BaseSchema):
+    """
+    Subset of document fields, used as Beanie `projection_model`: Mongo returns only these fields.
+    """
+
+    id: MongoDbId = Field(alias="_id", serialization_alias="id")
+    "MongoDB document ObjectID"
+
+    @classmethod
+    def projection(cls) -> dict[str, int]:
+        return get_projection(cls)
+
+
+@functools.lru_cache(maxsize=128)
+def projection_model(
+    document: type[BaseModel], fields: tuple[str, ...], name: str | None = None
+) -> type[ProjectionSchema]:
+    """
+    Model with `id` and given fields of the document (types, defaults and docs are copied).
+
+    :raises ValueError: if some field is not a field of the document
+    """
+    unknown = set(fields) - set(document.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    definitions = {
+        field: (document.model_fields[field].annotation, document.model_fields[field])
+        for field in fields
+        if field != "id"
+    }
+    return create_model(name or f"{document.__name__}Projection", __base__=ProjectionSchema, **definitions)
+
+
+def resolve_projection(
+    document: type[BaseModel], presets: dict[str, type[ProjectionSchema]], fields: str | None
+) -> type[ProjectionSchema] | None:
+    """
+    Projection model for `fields` query parameter: name of a preset or comma-separated field names.
+    None means the whole document.
+
+    :raises ValueError: if some field is not a field of the document
+    """
+    if not fields:
+        return None
+    if fields in presets:
+        return presets[fields]
+    names = tuple(sorted({name.strip() for name in fields.split(",") if name.strip()}))
+    return projection_model(document, names)
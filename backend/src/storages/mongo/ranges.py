@@ -0,0 +1,31 @@
+__all__ = ["overlap_query"]
+
+from typing import Any
+
+
+def overlap_query(lo_field: str, hi_field: str, min_: Any, max_: Any, nulls_unbounded: bool = False) -> dict:
+    """
+    Condition for documents whose interval [`lo_field`, `hi_field`] intersects [`min_`, `max_`]:
+    `lo_field <= max_` and `hi_field >= min_`. `None` bound of the filter means it is not limited.
+
+    With `nulls_unbounded=True` missing or null field of the document also means "not limited"
+    (e.g. an event without age restrictions), otherwise such documents do not match.
+    Pass the same field twice to check that a single value is within [`min_`, `max_`].
+    Each predicate is a plain range on one field, so it can be served by an index on that field.
+    """
+    clauses = []
+    for field, op, bound in ((lo_field, "$lte", max_), (hi_field, "$gte", min_)):
+        if bound is None:
+            continue
+        clause = {field: {op: bound}}
+        if nulls_unbounded:
+            clause = {"$or": [clause, {field: None}]}
+        clauses.append(clause)
+
+    if not clauses:
+        return {}
+    if len(clauses) == 1:
+        return clauses[0]
+    if not nulls_unbounded and lo_field == hi_field:
+        return {lo_field: {"$lte": max_, "$gte": min_}}
+    return {"$and": clauses}
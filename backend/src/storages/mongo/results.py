@@ -1,9 +1,14 @@
+from collections.abc import Iterable
+
 from beanie import PydanticObjectId
-from pydantic import model_validator
+from pydantic import Field, model_validator
 from pymongo import IndexModel
 
 from src.pydantic_base import BaseSchema
 from src.storages.mongo.__base__ import CustomDocument
+from src.storages.mongo.projection import projection_model
+from src.storages.mongo.trigrams import normalize_text
+from src.storages.mongo.versioning import Versioned
 
 
 class ParticipantRef(BaseSchema):
@@ -59,6 +64,47 @@ class ResultsSchema(BaseSchema):
     "Места участников"
 
 
-class Results(ResultsSchema, CustomDocument):
+class Results(ResultsSchema, Versioned, CustomDocument):
+    team_keys: list[str] = Field(default_factory=list, exclude=True)
+    "Нормализованные названия команд в порядке `team_places` (заполняются при записи)"
+    participant_keys: list[str] = Field(default_factory=list, exclude=True)
+    "Идентификаторы участников: `id:<ID>` для участников из реестра, `name:<ФИО>` для остальных (заполняются при записи)"
+
     class Settings:
-        indexes = [IndexModel("event_id", unique=True)]
+        indexes = [
+            IndexModel("event_id", unique=True),
+            IndexModel("solo_places.participant.id"),
+            IndexModel("team_places.members.id"),
+            IndexModel("team_keys"),
+            IndexModel("participant_keys"),
+        ]
+
+
+def team_key(team: str | None) -> str:
+    """
+    Identity of a team: its name normalized without transliteration, so `One-Zero-Eight` and `one zero eight`
+    are the same team.
+    """
+    return normalize_text(team, transliterate=False) if team else ""
+
+
+def team_keys(teams: Iterable[str | None]) -> list[str]:
+    """
+    Keys of the teams in the same order (empty for unnamed ones), so they can be zipped with `team_places`.
+    """
+    return [team_key(team) for team in teams]
+
+
+def participant_keys(results: ResultsSchema) -> list[str]:
+    """
+    Distinct identities of participants of the results: ids of registered participants, normalized names
+    of the others.
+    """
+    refs = [place.participant for place in results.solo_places or []]
+    refs += [member for place in results.team_places or [] for member in place.members]
+    return sorted({f"id:{ref.id}" if ref.id else f"name:{normalize_text(ref.name)}" for ref in refs})
+
+
+ResultsCard = projection_model(Results, ("event_id", "event_title", "protocols"), "ResultsCard")
+"Результаты без мест: мероприятие и протоколы"
+RESULTS_PROJECTIONS = {"card": ResultsCard}
@@ -0,0 +1,103 @@
+import pymongo
+from beanie import PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel
+
+from src.pydantic_base import BaseSchema
+from src.storages.mongo.__base__ import CustomDocument
+from src.storages.mongo.results import SoloPlace, TeamPlace
+
+
+class Participation(BaseSchema):
+    result_id: PydanticObjectId
+    event_id: PydanticObjectId
+    event_title: str
+    solo_place: SoloPlace | None = None
+    team_place: TeamPlace | None = None
+
+
+class ParticipantStandingSchema(BaseSchema):
+    """
+    Итоги участника по всем результатам мероприятий. Поддерживается при изменении результатов.
+    """
+
+    name: str = ""
+    "ФИО участника"
+    participations: list[Participation] = []
+    "Участия"
+    total: int = 0
+    "Общее количество участий"
+    golds: int = 0
+    "Общее количество золотых медалей"
+    silvers: int = 0
+    "Общее количество серебрянных медалей"
+    bronzes: int = 0
+    "Общее количество бронзовых медалей"
+    rank: int = 0
+    "Место в рейтинге (при одинаковых медалях и участиях место одно)"
+
+
+class ParticipantStanding(ParticipantStandingSchema, CustomDocument):
+    """
+    ID совпадает с ID участника.
+    """
+
+    name_keys: list[str] = Field(default_factory=list, exclude=True)
+    "Нормализованное ФИО и его перестановки по словам для поиска"
+
+    class Settings(CustomDocument.Settings):
+        indexes = [
+            IndexModel([("rank", pymongo.ASCENDING), ("name", pymongo.ASCENDING)]),
+            IndexModel(
+                [
+                    ("golds", pymongo.DESCENDING),
+                    ("silvers", pymongo.DESCENDING),
+                    ("bronzes", pymongo.DESCENDING),
+                    ("total", pymongo.DESCENDING),
+                ]
+            ),
+            IndexModel([("name_keys", pymongo.ASCENDING)]),
+        ]
+
+
+class TeamStandingSchema(BaseSchema):
+    """
+    Итоги команды по всем результатам мероприятий. Поддерживается при изменении результатов.
+    """
+
+    key: str
+    "Нормализованное название команды (идентификатор команды)"
+    name: str
+    "Название команды (как в первом по порядку результате)"
+    participations: list[Participation] = []
+    "Участия"
+    total: int = 0
+    "Общее количество участий"
+    golds: int = 0
+    "Общее количество золотых медалей"
+    silvers: int = 0
+    "Общее количество серебрянных медалей"
+    bronzes: int = 0
+    "Общее количество бронзовых медалей"
+    rank: int = 0
+    "Место в рейтинге (при одинаковых медалях и участиях место одно)"
+
+
+class TeamStanding(TeamStandingSchema, CustomDocument):
+    name_keys: list[str] = Field(default_factory=list, exclude=True)
+    "Нормализованное название и его перестановки по словам для поиска"
+
+    class Settings(CustomDocument.Settings):
+        indexes = [
+            IndexModel([("key", pymongo.ASCENDING)], unique=True),
+            IndexModel([("rank", pymongo.ASCENDING), ("name", pymongo.ASCENDING)]),
+            IndexModel(
+                [
+                    ("golds", pymongo.DESCENDING),
+                    ("silvers", pymongo.DESCENDING),
+                    ("bronzes", pymongo.DESCENDING),
+                    ("total", pymongo.DESCENDING),
+                ]
+            ),
+            IndexModel([("name_keys", pymongo.ASCENDING)]),
+        ]
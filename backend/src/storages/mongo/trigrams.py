@@ -0,0 +1,165 @@
+__all__ = [
+    "FUZZY_CANDIDATES",
+    "FUZZY_THRESHOLD",
+    "fuzzy_ids",
+    "fuzzy_pipeline",
+    "name_keys",
+    "normalize_text",
+    "rebuild_derived",
+    "rebuild_trigrams",
+    "trigram_similarity",
+    "trigrams",
+]
+
+import re
+from collections.abc import Callable
+from typing import Any
+
+from beanie import Document, PydanticObjectId
+from pymongo import UpdateOne
+
+FUZZY_THRESHOLD = 0.4
+"Минимальная доля триграмм запроса, которые должны быть в документе"
+FUZZY_CANDIDATES = 500
+"Сколько документов из индекса оценивается для ранжирования по сходству"
+
+# Longest sequences first
+_TRANSLITERATION = [
+    ("shch", "щ"),
+    ("sch", "щ"),
+    ("zh", "ж"),
+    ("kh", "х"),
+    ("ts", "ц"),
+    ("ch", "ч"),
+    ("sh", "ш"),
+    ("yu", "ю"),
+    ("ya", "я"),
+    ("yo", "е"),
+    ("ye", "е"),
+    ("iy", "ий"),
+    ("yy", "ый"),
+    ("ey", "ей"),
+    ("ay", "ай"),
+    ("oy", "ой"),
+    ("x", "кс"),
+    ("j", "дж"),
+]
+_LETTERS = str.maketrans("abvgdezijklmnoprstufhcwqy", "абвгдезийклмнопрстуфхцвкы")
+_NOT_WORD = re.compile(r"[^\w]+|_")
+
+
+def normalize_text(text: str, transliterate: bool = True) -> str:
+    """
+    Lower-case, `ё` → `е`, punctuation and repeated whitespace → one space. With `transliterate`
+    latin letters are replaced by cyrillic ones, so `Ivanov` and `Иванов` are the same.
+    """
+    text = text.lower().replace("ё", "е")
+    if transliterate:
+        for latin, cyrillic in _TRANSLITERATION:
+            text = text.replace(latin, cyrillic)
+        text = text.translate(_LETTERS)
+    return " ".join(_NOT_WORD.sub(" ", text).split())
+
+
+def trigrams(text: str | None) -> list[str]:
+    """
+    Sorted distinct trigrams of normalized words, padded as in PostgreSQL `pg_trgm`: two spaces before
+    a word and one after it, so beginnings of words weigh more.
+    """
+    if not text:
+        return []
+    grams = set()
+    for word in normalize_text(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return sorted(grams)
+
+
+def name_keys(name: str | None) -> list[str]:
+    """
+    Normalized name and all its rotations by words, so a prefix of the name written from any word matches:
+    `Иванов Пётр Сергеевич` → `иванов петр сергеевич`, `петр сергеевич иванов`, `сергеевич иванов петр`.
+    """
+    words = normalize_text(name).split() if name else []
+    keys = [" ".join(words[i:] + words[:i]) for i in range(len(words))]
+    return list(dict.fromkeys(keys))
+
+
+def trigram_similarity(field: str, grams: list[str]) -> dict:
+    """
+    Aggregation expression: share of `grams` (trigrams of the query) contained in the array `field`.
+    """
+    shared = {"$size": {"$setIntersection": [{"$ifNull": [f"${field}", []]}, grams]}}
+    return {"$divide": [shared, max(len(grams), 1)]}
+
+
+def _lookup_grams(grams: list[str]) -> list[str]:
+    """
+    Trigrams to look up in the index: without `"  x"` ones (the first letter of a word), which are shared
+    by a large part of any collection. All of them if the query consists of such trigrams only.
+    """
+    return [gram for gram in grams if not gram.startswith("  ")] or grams
+
+
+def fuzzy_pipeline(
+    field: str,
+    query: str,
+    limit: int,
+    threshold: float = FUZZY_THRESHOLD,
+    candidates: int = FUZZY_CANDIDATES,
+) -> list[dict]:
+    """
+    Pipeline of at most `limit` documents most similar to `query`, the best first (similarity is in `_similarity`).
+    At most `candidates` documents found by the index are ranked, so the work does not grow with the collection.
+    Candidates share a trigram from inside a word with the query, not just the first letter.
+    """
+    grams = trigrams(query)
+    return [
+        {"$match": {field: {"$in": _lookup_grams(grams)}}},
+        {"$limit": candidates},
+        {"$addFields": {"_similarity": trigram_similarity(field, grams)}},
+        {"$match": {"_similarity": {"$gte": threshold}}},
+        {"$sort": {"_similarity": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+
+
+async def fuzzy_ids(
+    document: type[Document],
+    field: str,
+    query: str,
+    threshold: float = FUZZY_THRESHOLD,
+    candidates: int = FUZZY_CANDIDATES,
+) -> list[PydanticObjectId]:
+    """
+    Ids of documents similar to `query` by trigrams of `field`, the most similar first, see `fuzzy_pipeline`.
+    """
+    pipeline = [*fuzzy_pipeline(field, query, candidates, threshold, candidates), {"$project": {"_id": 1}}]
+    return [doc["_id"] async for doc in document.get_motor_collection().aggregate(pipeline)]
+
+
+async def rebuild_derived(
+    document: type[Document], source: str | list[str], field: str, derive: Callable[[Any], Any], batch: int = 1000
+) -> None:
+    """
+    Recalculate `field` as `derive(source)` for all documents of the collection (backfill). With several `source`
+    fields `derive` gets the document with only them.
+    """
+    collection = document.get_motor_collection()
+    fields = [source] if isinstance(source, str) else source
+    updates = []
+    async for doc in collection.find({}, dict.fromkeys(fields, 1)):
+        value = derive(doc.get(source) if isinstance(source, str) else doc)
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: value}}))
+        if len(updates) >= batch:
+            await collection.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+
+
+async def rebuild_trigrams(document: type[Document], source: str, field: str = "trigrams") -> None:
+    """
+    Recalculate trigrams of `source` for all documents of the collection (backfill).
+    """
+    await rebuild_derived(document, source, field, trigrams)
@@ -0,0 +1,53 @@
+__all__ = ["CollectionVersion", "CollectionVersionSchema", "Versioned", "revised"]
+
+import datetime
+from typing import Self
+
+from pymongo import IndexModel
+
+from src.pydantic_base import BaseSchema
+from src.storages.mongo.__base__ import CustomDocument
+
+
+class Versioned(BaseSchema):
+    """
+    Mixin for documents which revision is used for conditional requests (ETag).
+    """
+
+    updated_at: datetime.datetime | None = None
+    "Время последнего изменения (None - не менялся с момента появления версионирования)"
+    revision: int = 0
+    "Номер ревизии документа, увеличивается при каждом изменении"
+
+    def revise(self) -> Self:
+        """
+        Mark document as changed before `insert()` or `save()`.
+        """
+        self.updated_at = datetime.datetime.now(datetime.UTC)
+        self.revision += 1
+        return self
+
+
+def revised(update: dict) -> dict:
+    """
+    Add increment of revision and modification time to the update query of `Versioned` documents.
+    """
+    return {
+        **update,
+        "$set": {**update.get("$set", {}), "updated_at": datetime.datetime.now(datetime.UTC)},
+        "$inc": {**update.get("$inc", {}), "revision": 1},
+    }
+
+
+class CollectionVersionSchema(BaseSchema):
+    collection: str
+    "Название коллекции"
+    version: int = 0
+    "Номер версии коллекции, увеличивается при каждой записи в неё"
+    updated_at: datetime.datetime | None = None
+    "Время последней записи"
+
+
+class CollectionVersion(CollectionVersionSchema, CustomDocument):
+    class Settings(CustomDocument.Settings):
+        indexes = [IndexModel("collection", unique=True)]